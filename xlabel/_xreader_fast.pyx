@@ -0,0 +1,129 @@
+# _xreader_fast.pyx — MIT License
+# See LICENSE.txt for full terms. This header must be retained in redistributions.
+# cython: language_level=3, boundscheck=False, wraparound=False
+
+"""
+Compiled version of the per-annotation loop of reader._parse_xlDa_chunk_data.
+
+Optional: reader.py falls back to its pure-Python loop when this module is not built.
+Build it in place with:  cythonize -i _xreader_fast.pyx
+"""
+import json
+import sys
+
+from libc.stdint cimport int32_t, uint16_t, uint32_t
+from libc.string cimport memchr, memcpy
+
+cdef enum:
+    SEG_TYPE_NONE = 0x00
+    SEG_TYPE_POLYGON = 0x01
+    SEG_TYPE_RLE = 0x02
+    ANN_FIXED_SIZE = 22 # class_id, bbox, score
+
+def _intern_keys(pairs):
+    return {sys.intern(k): v for k, v in pairs}
+
+# Same decoder as reader._ATTRS_DECODER: attribute keys are interned across annotations.
+cdef object _attrs_decoder = json.JSONDecoder(object_pairs_hook=_intern_keys)
+
+# Little-endian loads assembled byte by byte, so the result does not depend on host order.
+cdef inline uint16_t _u16(const unsigned char *p) noexcept nogil:
+    return <uint16_t>(p[0] | (p[1] << 8))
+
+cdef inline uint32_t _u32(const unsigned char *p) noexcept nogil:
+    return (<uint32_t>p[0]) | (<uint32_t>p[1] << 8) | (<uint32_t>p[2] << 16) | (<uint32_t>p[3] << 24)
+
+cdef inline float _f32(const unsigned char *p) noexcept nogil:
+    cdef uint32_t bits = _u32(p)
+    cdef float value
+    memcpy(&value, &bits, 4)
+    return value
+
+
+def parse_annotations(buf, Py_ssize_t off, Py_ssize_t end, Py_ssize_t num_annotations,
+                      bint with_segmentation, error, logger):
+    """
+    Parses num_annotations records from buf[off:end] and returns (annotations, off).
+    Same records, checks and messages as the Python loop; truncation raises error.
+    """
+    cdef const unsigned char[::1] data = buf
+    cdef const unsigned char *base = &data[0] if data.shape[0] else NULL
+    cdef const unsigned char *p
+    cdef const unsigned char *nul
+    cdef Py_ssize_t ann_fixed = ANN_FIXED_SIZE + (1 if with_segmentation else 0)
+    cdef Py_ssize_t ann_idx, part, i, num_poly_parts, num_points, num_rle_counts
+    cdef unsigned char seg_type
+    cdef float score_val
+    cdef list annotations = [None] * num_annotations
+    cdef list polygons, coords, rle_counts
+    cdef dict ann
+    decode_attrs = _attrs_decoder.decode
+
+    if end > data.shape[0]: end = data.shape[0]
+    for ann_idx in range(num_annotations):
+        if end - off < ann_fixed: raise error(f"Ann {ann_idx}: EOF reading fixed fields.")
+        p = base + off
+        ann = {"class_id": _u16(p),
+               "bbox": [<int32_t>_u32(p + 2), <int32_t>_u32(p + 6), <int32_t>_u32(p + 10), <int32_t>_u32(p + 14)]}
+        score_val = _f32(p + 18)
+        off += ANN_FIXED_SIZE
+        if score_val != -1.0: ann["score"] = <double>score_val
+
+        if with_segmentation:
+            seg_type = base[off]
+            off += 1
+
+            if seg_type == SEG_TYPE_POLYGON:
+                if end < off + 4: raise error(f"Ann {ann_idx} poly: EOF reading num_poly_parts.")
+                num_poly_parts = _u32(base + off)
+                off += 4
+                if end - off < 4 * num_poly_parts:
+                    raise error(f"Ann {ann_idx}: num_poly_parts {num_poly_parts} exceeds remaining data.")
+                polygons = []
+                for part in range(num_poly_parts):
+                    if end < off + 4: raise error(f"Ann {ann_idx} poly part {part + 1}: EOF reading num_points.")
+                    num_points = _u32(base + off)
+                    off += 4
+                    if end < off + 8 * num_points:
+                        raise error(f"Ann {ann_idx} poly point {(end - off) // 8 + 1}: EOF reading coords.")
+                    coords = [None] * (2 * num_points)
+                    p = base + off
+                    for i in range(2 * num_points):
+                        coords[i] = <int32_t>_u32(p + 4 * i)
+                    polygons.append(coords)
+                    off += 8 * num_points
+                ann["segmentation"] = polygons
+            elif seg_type == SEG_TYPE_RLE:
+                if end < off + 8: raise error(f"Ann {ann_idx} RLE: EOF reading rle_size.")
+                rle_size = [_u32(base + off), _u32(base + off + 4)]
+                off += 8
+
+                if end < off + 4: raise error(f"Ann {ann_idx} RLE: EOF reading num_rle_counts.")
+                num_rle_counts = _u32(base + off)
+                off += 4
+
+                if end < off + 4 * num_rle_counts:
+                    raise error(f"Ann {ann_idx} RLE count {(end - off) // 4 + 1}: EOF reading count.")
+                rle_counts = [None] * num_rle_counts
+                p = base + off
+                for i in range(num_rle_counts):
+                    rle_counts[i] = _u32(p + 4 * i)
+                off += 4 * num_rle_counts
+                ann["segmentation"] = {"rle_size": rle_size, "rle_counts": rle_counts}
+            elif seg_type != SEG_TYPE_NONE:
+                logger.warning(f"Ann {ann_idx}: Unknown segmentation type {seg_type}.")
+
+        nul = NULL
+        if off < end: nul = <const unsigned char *>memchr(base + off, 0, end - off)
+        if nul == NULL: raise error(f"Ann {ann_idx}: EOF reading custom attributes.")
+        if nul > base + off:
+            custom_attrs_json = (<const char *>(base + off))[:nul - (base + off)].decode('utf-8')
+            try: ann["custom_attributes"] = decode_attrs(custom_attrs_json)
+            except json.JSONDecodeError as e_json:
+                logger.warning(f"Ann {ann_idx}: JSON decode error for custom_attributes: '{custom_attrs_json}'. Error: {e_json}")
+                ann["custom_attributes"] = {}
+        else: ann["custom_attributes"] = {}
+        off = nul - base + 1
+        annotations[ann_idx] = ann
+
+    return annotations, off
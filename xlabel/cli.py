@@ -172,12 +172,18 @@ def handle_read_batch(args):
 
     cli_logger.info(f"Found {len(xlabel_png_files_found)} XLabel PNGs to process in '{args.input_xlabel_dir}'. Exporting metadata to JSON sidecar files.")
 
-    for png_path in xlabel_png_files_found:
+    for png_path, metadata, read_error in xreader.read_xlabel_metadata_batch(xlabel_png_files_found):
         base_filename_no_ext = os.path.splitext(os.path.basename(png_path))[0]
         output_json_path = os.path.join(output_dir, base_filename_no_ext + ".json")
         cli_logger.info(f"Processing XLabel PNG: {png_path}")
+        if read_error is not None:
+            if isinstance(read_error, xreader.XLabelError):
+                cli_logger.error(f"  Error reading XLabel data from '{png_path}': {read_error}", exc_info=read_error if args.debug else False)
+            else:
+                cli_logger.error(f"  An unexpected error occurred while processing '{png_path}': {read_error}", exc_info=read_error if args.debug else False)
+            error_count += 1
+            continue
         try:
-            metadata = xreader.read_xlabel_metadata_from_png(png_path)
             if metadata: 
                 with open(output_json_path, 'w') as f:
                     json.dump(metadata, f, indent=args.indent)
@@ -421,11 +427,17 @@ def handle_convert_fromxlabel_batch(args):
         global_category_map = {} 
     all_yolo_class_names = set()
 
-    for png_path in xlabel_png_files_found:
+    for png_path, metadata, read_error in xreader.read_xlabel_metadata_batch(xlabel_png_files_found):
         base_filename_no_ext = os.path.splitext(os.path.basename(png_path))[0]
         cli_logger.info(f"Processing XLabel PNG: {png_path}")
+        if read_error is not None:
+            if isinstance(read_error, xreader.XLabelError):
+                cli_logger.error(f"  XLabel Processing/Conversion Error for '{png_path}': {read_error}", exc_info=read_error if args.debug else False)
+            else:
+                cli_logger.error(f"  Unexpected error converting '{png_path}': {read_error}", exc_info=read_error if args.debug else False)
+            error_count += 1
+            continue
         try:
-            metadata = xreader.read_xlabel_metadata_from_png(png_path)
             if not metadata: 
                 cli_logger.warning(f"  No XLabel metadata found in '{png_path}'. Skipping."); 
                 continue
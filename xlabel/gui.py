@@ -16,18 +16,20 @@ try:
         QListWidget, QListWidgetItem
     )
     from PySide6.QtGui import QAction, QPixmap, QPainter, QColor, QPen, QIcon
-    from PySide6.QtCore import Qt, QRect, QSize
+    from PySide6.QtCore import Qt, QRect, QSize, QSettings
 except ImportError:
     print("PySide6 is not installed. Please install it: pip install PySide6")
     sys.exit(1)
 
 # Import XLabel core modules (assuming they are in the same directory or Python path)
 try:
+    import numpy as np
     import reader 
     import creator
+    from xlabel_gui._geometry import visible_rects
     # import xlabel_format_converters # We'll use this later
 except ImportError as e:
-    print(f"Could not import XLabel core modules: {e}. Ensure they are in the Python path.")
+    print(f"Could not import XLabel core modules: {e}. Ensure they are in the Python path (GUI dependencies: pip install -e .[gui]).")
     sys.exit(1)
 
 # --- Setup Logger for GUI ---
@@ -45,6 +47,12 @@ class XLabelMainWindow(QMainWindow):
         self.current_image_path = None
         self.current_xlabel_metadata = None
         self.original_pixmap = None # To store the loaded image without annotations
+        self._metadata_revision = 0 # Bumped whenever current_xlabel_metadata changes
+        self._last_paint_key = None # (label size, revision, pixmap) of the pixmap currently shown
+        self._set_annotation_arrays([])
+        self._draw_labels = [] # Per-annotation label text, built once in update_annotation_list
+        self._settings = QSettings("XLabel", "gui")
+        self._last_dir = self._settings.value("last_dir", "")
 
         self._create_widgets()
         self._create_layouts()
@@ -138,36 +146,43 @@ class XLabelMainWindow(QMainWindow):
     # --- Action Handlers ---
     def open_file_dialog(self):
         gui_logger.info("Open file dialog triggered.")
-        # Assuming reader and creator are in the same directory or Python path
-        file_path, _ = QFileDialog.getOpenFileName(
+        # Qt's own dialog avoids the native one's synchronous mount/thumbnail probing,
+        # and an explicit start directory skips the "last known folder" lookup.
+        dialog = QFileDialog(
             self, 
             "Open XLabel PNG File", 
-            "", # Start directory (empty means current or last used)
+            self._last_dir or "",
             "XLabel PNG Files (*.png);;All Files (*)"
         )
+        dialog.setOptions(QFileDialog.Option.DontUseNativeDialog | QFileDialog.Option.DontResolveSymlinks)
+        dialog.setFileMode(QFileDialog.FileMode.ExistingFile)
         
-        if file_path:
+        if dialog.exec():
+            file_path = dialog.selectedFiles()[0]
             gui_logger.info(f"File selected: {file_path}")
+            self._last_dir = os.path.dirname(file_path)
+            self._settings.setValue("last_dir", self._last_dir)
             self.load_xlabel_png(file_path)
 
     def load_xlabel_png(self, file_path):
         try:
             self.current_xlabel_metadata = reader.read_xlabel_metadata_from_png(file_path)
+            self._metadata_revision += 1
             if self.current_xlabel_metadata:
+                self._set_annotation_arrays(self.current_xlabel_metadata.get("annotations", []))
                 self.statusBar().showMessage(f"Loaded: {os.path.basename(file_path)} - XLabel v{self.current_xlabel_metadata.get('xlabel_version', 'Unknown')}")
+                # The lists only need the metadata, so fill them before paying for the pixel decode.
+                self.update_annotation_list()
+                self.update_class_list()
                 
                 self.original_pixmap = QPixmap(file_path)
                 if self.original_pixmap.isNull():
                     QMessageBox.warning(self, "Load Error", f"Could not load image data from '{file_path}'.")
-                    self.current_image_path = None
-                    self.current_xlabel_metadata = None
-                    self.original_pixmap = None
+                    self.clear_lists_and_metadata()
                     return
 
                 self.current_image_path = file_path
                 self.display_image_with_annotations()
-                self.update_annotation_list()
-                self.update_class_list()
                 self.save_as_action.setEnabled(True)
                 # self.save_action will be enabled on modification
             else:
@@ -178,6 +193,7 @@ class XLabelMainWindow(QMainWindow):
                          QMessageBox.information(self, "No XLabel Data", 
                                                 f"'{os.path.basename(file_path)}' is a valid PNG but does not contain XLabel metadata (xlDa chunk).")
                          self.image_label.setPixmap(pm.scaled(self.image_label.size(), Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation))
+                         self._last_paint_key = None
                          self.clear_lists_and_metadata()
                     else: # Not even a valid image
                         QMessageBox.warning(self, "Load Error", f"Could not load '{os.path.basename(file_path)}' as an image or XLabel PNG.")
@@ -201,32 +217,32 @@ class XLabelMainWindow(QMainWindow):
     def display_image_with_annotations(self):
         if not self.original_pixmap or self.original_pixmap.isNull():
             self.image_label.setText("No image loaded.")
+            self._last_paint_key = None
+            return
+
+        # Skip the redraw (and the label's full repaint) if nothing it depends on changed.
+        label_size = self.image_label.size()
+        paint_key = (label_size.width(), label_size.height(), self._metadata_revision, id(self.original_pixmap))
+        if paint_key == self._last_paint_key:
             return
 
         # Create a mutable copy to draw on
         pixmap_to_display = self.original_pixmap.copy()
         painter = QPainter(pixmap_to_display)
         
-        if self.current_xlabel_metadata and self.current_xlabel_metadata.get("annotations"):
+        if self.current_xlabel_metadata and len(self._bbox_arr):
             pen = QPen(QColor("red")) # Default color for bboxes
             pen.setWidth(2)
             painter.setPen(pen)
-            
-            class_names = self.current_xlabel_metadata.get("class_names", [])
 
-            for ann in self.current_xlabel_metadata["annotations"]:
-                bbox = ann.get("bbox")
-                if bbox and len(bbox) == 4:
-                    x, y, w, h = bbox
-                    painter.drawRect(QRect(int(x), int(y), int(w), int(h)))
-                    
-                    # Draw class name label near the bbox
-                    class_id = ann.get("class_id")
-                    label_text = f"Obj {ann_idx}" # Fallback
-                    if class_id is not None and 0 <= class_id < len(class_names):
-                        label_text = class_names[class_id]
-                    
-                    painter.drawText(int(x), int(y) - 5, label_text) # Draw text above the box
+            # Cull boxes that lie entirely outside the image in one vectorized pass.
+            visible = visible_rects(self._bbox_arr, pixmap_to_display.width(), pixmap_to_display.height())
+            visible_boxes = self._bbox_arr[visible].tolist()
+            painter.drawRects([QRect(bx, by, bw, bh) for bx, by, bw, bh in visible_boxes])
+
+            # Draw class name labels above the boxes
+            for ann_idx, (bx, by, _, _) in zip(self._bbox_ann_idx[visible].tolist(), visible_boxes):
+                painter.drawText(bx, by - 5, self._draw_labels[ann_idx])
         
         painter.end()
         self.image_label.setPixmap(pixmap_to_display.scaled(
@@ -234,9 +250,17 @@ class XLabelMainWindow(QMainWindow):
             Qt.AspectRatioMode.KeepAspectRatio, 
             Qt.TransformationMode.SmoothTransformation
         ))
+        self._last_paint_key = paint_key
+
+    def _set_annotation_arrays(self, annotations):
+        """Packs the bboxes of annotations into an int32 array for drawing."""
+        rows = [(idx, ann) for idx, ann in enumerate(annotations) if ann.get("bbox") and len(ann["bbox"]) == 4]
+        self._bbox_ann_idx = np.asarray([idx for idx, _ in rows], dtype=np.intp)
+        self._bbox_arr = np.asarray([ann["bbox"] for _, ann in rows], dtype=np.int32).reshape(-1, 4)
 
     def update_annotation_list(self):
         self.annotation_list_widget.clear()
+        self._draw_labels = []
         if self.current_xlabel_metadata and self.current_xlabel_metadata.get("annotations"):
             class_names = self.current_xlabel_metadata.get("class_names", [])
             for idx, ann in enumerate(self.current_xlabel_metadata["annotations"]):
@@ -244,6 +268,9 @@ class XLabelMainWindow(QMainWindow):
                 class_name = "Unknown"
                 if class_id is not None and 0 <= class_id < len(class_names):
                     class_name = class_names[class_id]
+                    self._draw_labels.append(class_name)
+                else:
+                    self._draw_labels.append(f"Obj {idx}") # Fallback label drawn on the image
                 
                 bbox_str = "N/A"
                 if ann.get("bbox"):
@@ -264,7 +291,11 @@ class XLabelMainWindow(QMainWindow):
     def clear_lists_and_metadata(self):
         self.current_image_path = None
         self.current_xlabel_metadata = None
+        self._metadata_revision += 1
+        self._set_annotation_arrays([])
+        self._draw_labels = []
         self.original_pixmap = None
+        self._last_paint_key = None
         self.image_label.setText("Open an XLabel PNG file to view.")
         self.annotation_list_widget.clear()
         self.class_list_widget.clear()
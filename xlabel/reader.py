@@ -2,12 +2,26 @@
 # Author: Eraldo Marques <eraldo.bernardo@gmail.com> — Created: 2025-06-16
 # See LICENSE.txt for full terms. This header must be retained in redistributions.
 
+import array
+import functools
 import json
 import struct
-import io
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import mmap
 import os 
+import sys
 import logging 
 
+try:
+    from ._xreader_fast import parse_annotations as _parse_annotations_fast
+except ImportError:
+    try:
+        from _xreader_fast import parse_annotations as _parse_annotations_fast
+    except ImportError: # Optional Cython build; see _xreader_fast.pyx
+        _parse_annotations_fast = None
+
 logger = logging.getLogger(__name__)
 
 class XLabelError(Exception):
@@ -23,163 +37,335 @@ class XLabelVersionError(XLabelError):
     pass
 
 CHUNK_TYPE = b"xlDa"
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
 XLABEL_SUPPORTED_VERSIONS = ["0.1.0", "0.2.0"] 
 
 SEG_TYPE_NONE = 0x00
 SEG_TYPE_POLYGON = 0x01
 SEG_TYPE_RLE = 0x02
 
-def _parse_xlDa_chunk_data(chunk_data_bytes):
+# Pre-compiled little-endian field layouts used by the xlDa parser.
+_U8 = struct.Struct("<B")
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_U32_PAIR = struct.Struct("<II")
+_ANN_FIXED = struct.Struct("<Hiiiif") # class_id, bbox, score
+_CHUNK_HDR = struct.Struct(">I4s") # PNG chunk length and type
+_NUL_SCAN_WINDOW = 256
+_HEAD_READ_SIZE = 64 * 1024
+_NEED_MORE_DATA = object() # _find_xlDa_chunk: the head read ended mid-walk
+
+# Layouts of the variable-length runs, per count; shapes with the same count reuse one Struct.
+@functools.lru_cache(maxsize=256)
+def _poly_struct(num_points):
+    return struct.Struct(f"<{2 * num_points}i")
+
+@functools.lru_cache(maxsize=256)
+def _rle_struct(num_rle_counts):
+    return struct.Struct(f"<{num_rle_counts}I")
+
+def _intern_keys(pairs):
+    return {sys.intern(k): v for k, v in pairs}
+
+# Attribute keys repeat across annotations; interning them keeps one copy of each name.
+# A prebuilt decoder parses as fast as json.loads, where passing the hook per call does not.
+_ATTRS_DECODER = json.JSONDecoder(object_pairs_hook=_intern_keys)
+
+def _find_nul(buf, start, end):
+    """Offset of the first NUL in buf[start:end], or -1."""
+    find = getattr(buf, "find", None)
+    if find is not None: return find(b'\0', start, end)
+    # A memoryview has no find(); scan it in windows so only the searched bytes are copied.
+    pos = start
+    while pos < end:
+        hit = bytes(buf[pos:min(pos + _NUL_SCAN_WINDOW, end)]).find(b'\0')
+        if hit >= 0: return pos + hit
+        pos += _NUL_SCAN_WINDOW
+    return -1
+
+def _read_custom_attributes(buf, off, end, ann_idx):
+    """Reads an annotation's NUL-terminated JSON attributes at off. Returns (attributes, off)."""
+    attrs_end = _find_nul(buf, off, end)
+    if attrs_end < 0: raise XLabelFormatError(f"Ann {ann_idx}: EOF reading custom attributes.")
+    if attrs_end == off: return {}, off + 1
+
+    custom_attrs_json = bytes(buf[off:attrs_end]).decode('utf-8')
+    try: return _ATTRS_DECODER.decode(custom_attrs_json), attrs_end + 1
+    except json.JSONDecodeError as e_json:
+        logger.warning(f"Ann {ann_idx}: JSON decode error for custom_attributes: '{custom_attrs_json}'. Error: {e_json}")
+        return {}, attrs_end + 1
+
+def _parse_annotations_v010(buf, off, end, num_annotations, numpy_output=False, compact_rle=False):
+    """Reads v0.1.0 annotation records (no segmentation). Returns (annotations, off)."""
+    ann_fixed_fields = _ANN_FIXED.unpack_from
+    fixed_size = _ANN_FIXED.size
+    read_attrs = _read_custom_attributes
+    annotations = [None] * num_annotations
+    for ann_idx in range(num_annotations):
+        try:
+            if end - off < fixed_size: raise XLabelFormatError(f"Ann {ann_idx}: EOF reading fixed fields.")
+            class_id, x, y, w, h, score_val = ann_fixed_fields(buf, off)
+            off += fixed_size
+            ann = {"class_id": class_id, "bbox": [x, y, w, h]}
+            if score_val != -1.0: ann["score"] = score_val
+            ann["custom_attributes"], off = read_attrs(buf, off, end, ann_idx)
+            annotations[ann_idx] = ann
+        except struct.error as e_struct: raise XLabelFormatError(f"Ann {ann_idx}: Struct unpack error: {e_struct}.")
+    return annotations, off
+
+def _parse_annotations_v020(buf, off, end, num_annotations, numpy_output=False, compact_rle=False):
+    """
+    Reads v0.2.0 annotation records, which add a segmentation block. Returns (annotations, off).
+    With numpy_output, polygon parts are (num_points, 2) int32 arrays and RLE counts a uint32 array.
+    With compact_rle (and no numpy_output), RLE counts are an array.array('I').
+    """
+    if numpy_output: import numpy as np
+    u8 = _U8.unpack_from
+    u32 = _U32.unpack_from
+    u32_pair = _U32_PAIR.unpack_from
+    ann_fixed_fields = _ANN_FIXED.unpack_from
+    fixed_size = _ANN_FIXED.size
+    # Bound once rather than looked up as globals for every annotation.
+    read_attrs = _read_custom_attributes
+    poly_struct, rle_struct = _poly_struct, _rle_struct
+    seg_polygon, seg_rle, seg_none = SEG_TYPE_POLYGON, SEG_TYPE_RLE, SEG_TYPE_NONE
+    annotations = [None] * num_annotations
+    for ann_idx in range(num_annotations):
+        try:
+            if end - off < fixed_size + 1: raise XLabelFormatError(f"Ann {ann_idx}: EOF reading fixed fields.")
+            class_id, x, y, w, h, score_val = ann_fixed_fields(buf, off)
+            seg_type, = u8(buf, off + fixed_size)
+            off += fixed_size + 1
+            ann = {"class_id": class_id, "bbox": [x, y, w, h]}
+            if score_val != -1.0: ann["score"] = score_val
+
+            if seg_type == seg_polygon:
+                if end < off + 4: raise XLabelFormatError(f"Ann {ann_idx} poly: EOF reading num_poly_parts.")
+                num_poly_parts, = u32(buf, off)
+                off += 4
+                if end - off < 4 * num_poly_parts:
+                    raise XLabelFormatError(f"Ann {ann_idx}: num_poly_parts {num_poly_parts} exceeds remaining data.")
+                polygons = [None] * num_poly_parts
+                for part in range(num_poly_parts):
+                    if end < off + 4: raise XLabelFormatError(f"Ann {ann_idx} poly part {part + 1}: EOF reading num_points.")
+                    num_points, = u32(buf, off)
+                    off += 4
+                    # All x, y pairs of the part in one call.
+                    if end < off + 8 * num_points:
+                        raise XLabelFormatError(f"Ann {ann_idx} poly point {(end - off) // 8 + 1}: EOF reading coords.")
+                    if numpy_output:
+                        # Copied so no array keeps the (possibly mapped) buffer exported.
+                        polygons[part] = np.frombuffer(buf, dtype="<i4", count=2 * num_points, offset=off).reshape(num_points, 2).copy()
+                    else:
+                        polygons[part] = list(poly_struct(num_points).unpack_from(buf, off))
+                    off += 8 * num_points
+                ann["segmentation"] = polygons
+            elif seg_type == seg_rle:
+                if end < off + 8: raise XLabelFormatError(f"Ann {ann_idx} RLE: EOF reading rle_size.")
+                rle_h, rle_w = u32_pair(buf, off)
+                off += 8
+
+                if end < off + 4: raise XLabelFormatError(f"Ann {ann_idx} RLE: EOF reading num_rle_counts.")
+                num_rle_counts, = u32(buf, off)
+                off += 4
+
+                if end < off + 4 * num_rle_counts:
+                    raise XLabelFormatError(f"Ann {ann_idx} RLE count {(end - off) // 4 + 1}: EOF reading count.")
+                if numpy_output:
+                    rle_counts = np.frombuffer(buf, dtype="<u4", count=num_rle_counts, offset=off).copy()
+                elif compact_rle:
+                    # One copy of the raw counts; no Python int per run.
+                    rle_counts = array.array("I", bytes(buf[off:off + 4 * num_rle_counts]))
+                    if sys.byteorder == "big": rle_counts.byteswap()
+                else:
+                    rle_counts = list(rle_struct(num_rle_counts).unpack_from(buf, off))
+                off += 4 * num_rle_counts
+                ann["segmentation"] = {"rle_size": [rle_h, rle_w], "rle_counts": rle_counts}
+            elif seg_type != seg_none:
+                logger.warning(f"Ann {ann_idx}: Unknown segmentation type {seg_type}.")
+
+            ann["custom_attributes"], off = read_attrs(buf, off, end, ann_idx)
+            annotations[ann_idx] = ann
+        except struct.error as e_struct: raise XLabelFormatError(f"Ann {ann_idx}: Struct unpack error: {e_struct}.")
+    return annotations, off
+
+# One specialized loop per record layout, chosen once per chunk instead of per annotation.
+_ANNOTATION_PARSERS = {"0.1.0": _parse_annotations_v010, "0.2.0": _parse_annotations_v020}
+
+def _parse_xlDa_chunk_data(chunk_data_bytes, start=0, end=None, numpy_output=False, compact_rle=False):
     """
     Deserializes the bytes from the xlDa chunk into a metadata dictionary.
+    chunk_data_bytes may be any bytes-like object (bytes, bytearray, mmap, memoryview);
+    start and end bound the payload within it, so a mapped file is parsed in place.
+    numpy_output returns segmentation coordinates as NumPy arrays (requires NumPy);
+    compact_rle returns RLE counts as array.array('I') without needing NumPy.
     Raises XLabelFormatError or XLabelVersionError on parsing issues.
     """
+    # Bound locally: these run once per field of every annotation.
+    u8 = _U8.unpack_from
+    u16 = _U16.unpack_from
+    u32 = _U32.unpack_from
+    u32_pair = _U32_PAIR.unpack_from
     try:
-        data_stream = io.BytesIO(chunk_data_bytes)
+        # Fields are unpacked in place at an explicit offset; unpack_from raises
+        # struct.error on a short buffer, just as a short read did.
+        buf = chunk_data_bytes
+        if not hasattr(buf, "find"): buf = memoryview(buf).cast("B")
+        if end is None: end = len(buf)
+        off = start
         metadata = {}
 
-        version_bytes = data_stream.read(16)
-        if len(version_bytes) < 16: raise XLabelFormatError("Chunk data too short to read version.")
-        format_version = version_bytes.split(b'\0', 1)[0].decode('utf-8')
+        if end < off + 16: raise XLabelFormatError("Chunk data too short to read version.")
+        format_version = bytes(buf[off:off + 16]).split(b'\0', 1)[0].decode('utf-8')
+        off += 16
         metadata["xlabel_version"] = format_version
         if format_version not in XLABEL_SUPPORTED_VERSIONS:
             logger.warning(f"Unsupported XLabel version: {format_version}. Attempting parse. Supported: {XLABEL_SUPPORTED_VERSIONS}")
 
         img_props = {}
-        filename_bytes = data_stream.read(256)
-        if len(filename_bytes) < 256: raise XLabelFormatError("Chunk data too short for filename.")
-        img_props["filename"] = filename_bytes.split(b'\0', 1)[0].decode('utf-8')
+        if end < off + 256: raise XLabelFormatError("Chunk data too short for filename.")
+        img_props["filename"] = bytes(buf[off:off + 256]).split(b'\0', 1)[0].decode('utf-8')
+        off += 256
         
-        img_dims_bytes = data_stream.read(struct.calcsize("<II"))
-        if len(img_dims_bytes) < struct.calcsize("<II"): raise XLabelFormatError("Chunk data too short for image dimensions.")
-        img_props["width"], img_props["height"] = struct.unpack("<II", img_dims_bytes)
+        if end < off + 8: raise XLabelFormatError("Chunk data too short for image dimensions.")
+        img_props["width"], img_props["height"] = u32_pair(buf, off)
+        off += 8
         metadata["image_properties"] = img_props
 
-        num_cn_bytes = data_stream.read(struct.calcsize("<H"))
-        if len(num_cn_bytes) < struct.calcsize("<H"): raise XLabelFormatError("Chunk data too short for num_class_names.")
-        num_class_names, = struct.unpack("<H", num_cn_bytes)
-        class_names = []
+        if end < off + 2: raise XLabelFormatError("Chunk data too short for num_class_names.")
+        num_class_names, = u16(buf, off)
+        off += 2
+        class_names = [None] * num_class_names
         for i in range(num_class_names):
-            len_name_bytes = data_stream.read(struct.calcsize("<B"))
-            if not len_name_bytes: raise XLabelFormatError(f"EOF reading class name len {i+1}/{num_class_names}.")
-            len_name, = struct.unpack("<B", len_name_bytes)
-            name_bytes = data_stream.read(len_name)
-            if len(name_bytes) < len_name: raise XLabelFormatError(f"EOF reading class name {i+1}/{num_class_names}.")
-            class_names.append(name_bytes.decode('utf-8'))
+            if off >= end: raise XLabelFormatError(f"EOF reading class name len {i+1}/{num_class_names}.")
+            len_name, = u8(buf, off)
+            off += 1
+            if end < off + len_name: raise XLabelFormatError(f"EOF reading class name {i+1}/{num_class_names}.")
+            class_names[i] = bytes(buf[off:off + len_name]).decode('utf-8')
+            off += len_name
         metadata["class_names"] = class_names
 
-        num_ann_bytes = data_stream.read(struct.calcsize("<I"))
-        if len(num_ann_bytes) < struct.calcsize("<I"): raise XLabelFormatError("Chunk data too short for num_annotations.")
-        num_annotations, = struct.unpack("<I", num_ann_bytes)
-        annotations = []
-        for ann_idx in range(num_annotations):
-            ann = {}
-            try:
-                ann["class_id"], = struct.unpack("<H", data_stream.read(struct.calcsize("<H")))
-                ann["bbox"] = list(struct.unpack("<iiii", data_stream.read(struct.calcsize("<iiii"))))
-                score_val, = struct.unpack("<f", data_stream.read(struct.calcsize("<f")))
-                if score_val != -1.0: ann["score"] = score_val
-
-                if format_version == "0.2.0": # Only parse segmentation for v0.2.0
-                    seg_type_bytes = data_stream.read(struct.calcsize("<B"))
-                    if not seg_type_bytes: raise XLabelFormatError(f"Ann {ann_idx}: EOF reading seg_type.")
-                    seg_type, = struct.unpack("<B", seg_type_bytes)
-                    
-                    if seg_type == SEG_TYPE_POLYGON:
-                        num_poly_parts_bytes = data_stream.read(struct.calcsize("<I"))
-                        if not num_poly_parts_bytes: raise XLabelFormatError(f"Ann {ann_idx} poly: EOF reading num_poly_parts.")
-                        num_poly_parts, = struct.unpack("<I", num_poly_parts_bytes)
-                        polygons = []
-                        for _ in range(num_poly_parts):
-                            num_points_bytes = data_stream.read(struct.calcsize("<I"))
-                            if not num_points_bytes: raise XLabelFormatError(f"Ann {ann_idx} poly part {_ + 1}: EOF reading num_points.")
-                            num_points, = struct.unpack("<I", num_points_bytes)
-                            poly_part = []
-                            for _p in range(num_points): 
-                                point_bytes = data_stream.read(struct.calcsize("<ii"))
-                                if len(point_bytes) < struct.calcsize("<ii"): raise XLabelFormatError(f"Ann {ann_idx} poly point {_p + 1}: EOF reading coords.")
-                                poly_part.extend(struct.unpack("<ii", point_bytes))
-                            polygons.append(poly_part)
-                        ann["segmentation"] = polygons
-                    elif seg_type == SEG_TYPE_RLE:
-                        rle_dims_bytes = data_stream.read(struct.calcsize("<II"))
-                        if len(rle_dims_bytes) < struct.calcsize("<II"): raise XLabelFormatError(f"Ann {ann_idx} RLE: EOF reading rle_size.")
-                        rle_h, rle_w = struct.unpack("<II", rle_dims_bytes)
-                        
-                        num_rle_counts_bytes = data_stream.read(struct.calcsize("<I"))
-                        if not num_rle_counts_bytes: raise XLabelFormatError(f"Ann {ann_idx} RLE: EOF reading num_rle_counts.")
-                        num_rle_counts, = struct.unpack("<I", num_rle_counts_bytes)
-                        
-                        rle_counts = []
-                        for _rc in range(num_rle_counts):
-                            count_byte = data_stream.read(struct.calcsize("<I"))
-                            if not count_byte: raise XLabelFormatError(f"Ann {ann_idx} RLE count {_rc + 1}: EOF reading count.")
-                            rle_counts.append(struct.unpack("<I", count_byte)[0])
-                        ann["segmentation"] = {"rle_size": [rle_h, rle_w], "rle_counts": rle_counts}
-                    elif seg_type != SEG_TYPE_NONE:
-                        logger.warning(f"Ann {ann_idx}: Unknown segmentation type {seg_type}.")
-                
-                custom_attrs_bytes_list = []
-                while True:
-                    byte = data_stream.read(1)
-                    if not byte: raise XLabelFormatError(f"Ann {ann_idx}: EOF reading custom attributes.")
-                    if byte == b'\0': break
-                    custom_attrs_bytes_list.append(byte)
-                
-                if custom_attrs_bytes_list:
-                    custom_attrs_json = b''.join(custom_attrs_bytes_list).decode('utf-8')
-                    try: ann["custom_attributes"] = json.loads(custom_attrs_json)
-                    except json.JSONDecodeError as e_json:
-                        logger.warning(f"Ann {ann_idx}: JSON decode error for custom_attributes: '{custom_attrs_json}'. Error: {e_json}")
-                        ann["custom_attributes"] = {} 
-                else: ann["custom_attributes"] = {}
-                annotations.append(ann)
-            except struct.error as e_struct: raise XLabelFormatError(f"Ann {ann_idx}: Struct unpack error: {e_struct}.")
+        if end < off + 4: raise XLabelFormatError("Chunk data too short for num_annotations.")
+        num_annotations, = u32(buf, off)
+        off += 4
+        # class_id, bbox and score, plus seg_type for v0.2.0: checked once per annotation.
+        ann_fixed = _ANN_FIXED.size + (1 if format_version == "0.2.0" else 0)
+        # Each annotation also ends in a NUL, so this bounds the count before lists are sized from it.
+        if num_annotations * (ann_fixed + 1) > end - off: raise XLabelFormatError(f"Chunk data too short for {num_annotations} annotations.")
+        if _parse_annotations_fast is not None and not (numpy_output or compact_rle):
+            annotations, off = _parse_annotations_fast(buf, off, end, num_annotations, format_version == "0.2.0", XLabelFormatError, logger)
+        else:
+            # Unknown versions are read with the v0.1.0 layout, as before.
+            parse_annotations = _ANNOTATION_PARSERS.get(format_version, _parse_annotations_v010)
+            annotations, off = parse_annotations(buf, off, end, num_annotations, numpy_output, compact_rle)
         metadata["annotations"] = annotations
         
-        remaining_data = data_stream.read()
-        if remaining_data: logger.warning(f"{len(remaining_data)} unread bytes in xlDa chunk.")
+        if off < end: logger.warning(f"{end - off} unread bytes in xlDa chunk.")
         return metadata
 
     except struct.error as e: raise XLabelFormatError(f"Struct unpacking error: {e}") from e
     except UnicodeDecodeError as e: raise XLabelFormatError(f"Unicode decode error: {e}") from e
-    except Exception as e: logger.error(f"Unexpected error parsing xlDa chunk: {e}", exc_info=True); raise XLabelError(f"Unexpected error parsing xlDa: {e}") from e
+    except (IndexError, ValueError) as e: raise XLabelFormatError(f"Malformed xlDa data: {e}") from e
+
+def _find_xlDa_chunk(buf, image_path, verify_crc=False, partial=False):
+    """
+    Walks the PNG chunk headers in buf (bytes or mmap) by offset and returns the
+    (offset, length) of the xlDa payload, or None if absent. Other chunks, IDAT
+    included, are skipped without being read. verify_crc checks the xlDa chunk's CRC.
+    With partial, buf is only the head of the file: if the walk runs off its end
+    before IEND or a complete xlDa chunk, _NEED_MORE_DATA is returned instead.
+    """
+    if buf[:8] != PNG_SIGNATURE:
+        raise XLabelFormatError(f"File '{image_path}' not valid PNG (signature mismatch).")
+
+    chunk_header = _CHUNK_HDR.unpack_from
+    pos, end = 8, len(buf)
+    while True:
+        if pos + 8 > end:
+            if partial: return _NEED_MORE_DATA
+            logger.warning(f"EOF reading chunk header in '{image_path}'."); return None
+        chunk_len, chunk_type_bytes = chunk_header(buf, pos)
+        pos += 8
+
+        if chunk_type_bytes == CHUNK_TYPE:
+            if partial and pos + chunk_len + (4 if verify_crc else 0) > end: return _NEED_MORE_DATA
+            logger.info(f"Found '{CHUNK_TYPE.decode()}' chunk, length {chunk_len} in '{image_path}'.")
+            if pos + chunk_len > end:
+                 raise XLabelFormatError(f"Incomplete chunk data for '{CHUNK_TYPE.decode()}' in '{image_path}'. Expected {chunk_len}, got {end - pos}.")
+            if verify_crc:
+                if pos + chunk_len + 4 > end:
+                    raise XLabelFormatError(f"Missing CRC for '{CHUNK_TYPE.decode()}' in '{image_path}'.")
+                # The CRC covers the chunk type and data; the view is released before buf can be closed.
+                with memoryview(buf) as view:
+                    crc = zlib.crc32(view[pos - 4:pos + chunk_len])
+                if crc != struct.unpack_from(">I", buf, pos + chunk_len)[0]:
+                    raise XLabelFormatError(f"CRC mismatch for '{CHUNK_TYPE.decode()}' in '{image_path}'.")
+            return pos, chunk_len
+        if chunk_type_bytes == b'IEND':
+            logger.info(f"IEND reached in '{image_path}'. '{CHUNK_TYPE.decode()}' not found."); return None
+        pos += chunk_len + 4 # data + CRC
 
-def read_xlabel_metadata_from_png(image_path):
+def read_xlabel_metadata_from_png(image_path, numpy_output=False, verify_crc=False, compact_rle=False):
     """
     Reads XLabel metadata from an xlDa chunk in a PNG image file.
+    With numpy_output, polygon and RLE segmentation is returned as NumPy arrays instead of lists;
+    with compact_rle, RLE counts are returned as array.array('I').
+    With verify_crc, the xlDa chunk's CRC is checked; other chunks are never read.
     Returns metadata dict or raises XLabelError (or its subclasses) on failure.
     """
     try:
         with open(image_path, "rb") as f:
-            if f.read(8) != b'\x89PNG\r\n\x1a\n':
-                raise XLabelFormatError(f"File '{image_path}' not valid PNG (signature mismatch).")
-            
-            while True:
-                chunk_len_bytes = f.read(4)
-                if not chunk_len_bytes: logger.warning(f"EOF reading chunk length in '{image_path}'."); break 
-                chunk_len = struct.unpack(">I", chunk_len_bytes)[0]
-                chunk_type_bytes = f.read(4)
-                if not chunk_type_bytes: logger.warning(f"EOF reading chunk type in '{image_path}'."); break
-
-                if chunk_type_bytes == CHUNK_TYPE:
-                    logger.info(f"Found '{CHUNK_TYPE.decode()}' chunk, length {chunk_len} in '{image_path}'.")
-                    chunk_data = f.read(chunk_len)
-                    if len(chunk_data) < chunk_len:
-                         raise XLabelFormatError(f"Incomplete chunk data for '{CHUNK_TYPE.decode()}' in '{image_path}'. Expected {chunk_len}, got {len(chunk_data)}.")
-                    _ = f.read(4) # Skip CRC
-                    return _parse_xlDa_chunk_data(chunk_data)
-                else:
-                    f.seek(chunk_len + 4, 1) # data + CRC
-                    if chunk_type_bytes == b'IEND':
-                        logger.info(f"IEND reached in '{image_path}'. '{CHUNK_TYPE.decode()}' not found."); break 
-        
+            # xlDa is written before IDAT, so the first read nearly always holds the whole
+            # chunk and it is parsed from there, with no mapping to set up.
+            buf = f.read(_HEAD_READ_SIZE)
+            chunk = _find_xlDa_chunk(buf, image_path, verify_crc, partial=len(buf) == _HEAD_READ_SIZE)
+            if chunk is _NEED_MORE_DATA:
+                try:
+                    # Map the file so only the chunk headers and the xlDa payload are paged in.
+                    buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except (ValueError, OSError): # Unmappable file
+                    buf += f.read()
+            try:
+                if chunk is _NEED_MORE_DATA:
+                    chunk = _find_xlDa_chunk(buf, image_path, verify_crc)
+                if chunk is not None:
+                    # Parsed in place from the head or the mapping; the payload is never copied out.
+                    chunk_start, chunk_len = chunk
+                    return _parse_xlDa_chunk_data(buf, chunk_start, chunk_start + chunk_len, numpy_output, compact_rle)
+            finally:
+                if isinstance(buf, mmap.mmap): buf.close()
+
         logger.info(f"'{CHUNK_TYPE.decode()}' chunk not found in '{image_path}'.")
         return None 
 
     except FileNotFoundError: logger.error(f"Image file '{image_path}' not found."); raise 
-    except XLabelError: raise
-    except Exception as e: logger.error(f"Unexpected error reading PNG '{image_path}': {e}", exc_info=True); raise XLabelError(f"Unexpected error reading PNG '{image_path}': {e}") from e
+    except (OSError, ValueError) as e: logger.error(f"Error reading PNG '{image_path}': {e}"); raise XLabelError(f"Error reading PNG '{image_path}': {e}") from e
+
+def read_xlabel_metadata_batch(paths, max_workers=None):
+    """
+    Reads XLabel metadata from many PNG files on a thread pool; the file I/O runs
+    without the GIL, so independent files overlap.
+    Lazily yields (path, metadata, error) in input order: metadata is None if the file
+    has no xlDa chunk, error is the exception reading it raised (metadata then None).
+    At most two reads per worker are in flight, so memory does not grow with the batch.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    pool = ThreadPoolExecutor(max_workers)
+    pending = deque()
+    try:
+        for path in paths:
+            pending.append((path, pool.submit(read_xlabel_metadata_from_png, path)))
+            if len(pending) >= 2 * max_workers:
+                yield _batch_result(*pending.popleft())
+        while pending:
+            yield _batch_result(*pending.popleft())
+    finally:
+        # Reached early if the caller stops iterating; queued reads are dropped.
+        pool.shutdown(cancel_futures=True)
+
+def _batch_result(path, future):
+    try: return path, future.result(), None
+    except Exception as e: return path, None, e
 
 if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
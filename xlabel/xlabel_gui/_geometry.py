@@ -0,0 +1,32 @@
+"""
+Numeric kernels for annotation geometry used on the GUI drawing paths.
+
+The kernels are written in array form so they run as plain NumPy when Numba is
+not installed. With Numba available they are compiled eagerly for the listed
+signatures at import time, so the first paint does not pay the JIT cost.
+"""
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # Numba is optional
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+
+@njit("b1[:](i4[:, :], i8, i8)", cache=True)
+def visible_rects(rects, width, height):
+    """Returns a mask of the [x, y, w, h] rows that overlap a width x height image."""
+    x = rects[:, 0]
+    y = rects[:, 1]
+    return (x + rects[:, 2] > 0) & (y + rects[:, 3] > 0) & (x < width) & (y < height)
+
+
+@njit("void(u1[:, :], u1[:, :])", cache=True)
+def mask_thumbnail(mask, out):
+    """Nearest-neighbour downsample of a single-channel mask into the preallocated out array."""
+    rows = (np.arange(out.shape[0]) * mask.shape[0]) // out.shape[0]
+    cols = (np.arange(out.shape[1]) * mask.shape[1]) // out.shape[1]
+    out[:, :] = mask[rows][:, cols]
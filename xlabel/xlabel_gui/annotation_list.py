@@ -1,6 +1,13 @@
+import numpy as np
 from PySide6.QtWidgets import QListWidget, QListWidgetItem
-from PySide6.QtCore import Signal, Qt, QRect
-from PySide6.QtGui import QPixmap, QIcon, QColor, QKeyEvent, QPainter
+from PySide6.QtCore import Signal, Qt
+from PySide6.QtGui import QPixmap, QPixmapCache, QIcon, QColor, QKeyEvent, QPainter
+from . import panels
+from .panels import AnnotationBatch
+from ._geometry import mask_thumbnail
+
+MASK_ICON_SIZE = 64
+MASK_ICON_COLOR = QColor(255, 0, 0, 70)
 
 class AnnotationList(QListWidget):
     annotation_selected = Signal(int)
@@ -8,32 +15,38 @@ class AnnotationList(QListWidget):
 
     def __init__(self, parent=None):
         super().__init__(parent)
+        QPixmapCache.setCacheLimit(32 * 1024)
         self.itemClicked.connect(self._on_item_clicked)
 
-    def set_annotations(self, annotations_data):
+    def set_annotations(self, batch: AnnotationBatch):
         self.clear()
         
-        annotations = annotations_data.get('completed', [])
-        
-        for i, annotation in enumerate(annotations):
-            item_text = f"Annotation {i + 1}"
-            icon = QIcon()
-
-            if isinstance(annotation, QPixmap):
-                icon_pixmap = QPixmap(64, 64)
-                icon_pixmap.fill(QColor(50, 50, 50))
-                painter = QPainter(icon_pixmap)
-                painter.drawPixmap(icon_pixmap.rect(), annotation.scaled(icon_pixmap.size(), Qt.KeepAspectRatio))
-                painter.end()
-                icon = QIcon(icon_pixmap)
-                item_text = f"Mask {i + 1}"
-            elif isinstance(annotation, QRect):
-                item_text = f"B-Box {i + 1}"
-            elif isinstance(annotation, list):
-                item_text = f"Polygon {i + 1}"
-            
-            list_item = QListWidgetItem(icon, item_text)
-            self.addItem(list_item)
+        for i, mask in enumerate(batch.masks):
+            self.addItem(QListWidgetItem(QIcon(self._mask_icon_pixmap(mask)), f"Mask {i + 1}"))
+        for i in range(len(batch.rects)):
+            self.addItem(QListWidgetItem(f"B-Box {i + 1}"))
+        for i in range(len(batch.polys)):
+            self.addItem(QListWidgetItem(f"Polygon {i + 1}"))
+
+    def _mask_icon_pixmap(self, mask) -> QPixmap:
+        # Completed masks are immutable MaskRLE tuples, so their hash identifies the icon
+        # and a list rebuild does not decode masks it has already drawn.
+        key = f"ann:{hash(mask)}"
+        icon_pixmap = QPixmapCache.find(key)
+        if icon_pixmap is not None and not icon_pixmap.isNull():
+            return icon_pixmap
+
+        # Downsampled straight from the uint8 mask, so only icon-sized pixels are converted.
+        thumbnail = np.empty((MASK_ICON_SIZE, MASK_ICON_SIZE), dtype=np.uint8)
+        mask_thumbnail(panels.decode_mask(mask), thumbnail)
+
+        icon_pixmap = QPixmap(MASK_ICON_SIZE, MASK_ICON_SIZE)
+        icon_pixmap.fill(QColor(50, 50, 50))
+        painter = QPainter(icon_pixmap)
+        painter.drawPixmap(0, 0, panels.mask_to_pixmap(thumbnail, MASK_ICON_COLOR))
+        painter.end()
+        QPixmapCache.insert(key, icon_pixmap)
+        return icon_pixmap
 
     def _on_item_clicked(self, item):
         self.annotation_selected.emit(self.row(item))
@@ -1,14 +1,21 @@
+import numpy as np
 from PySide6.QtWidgets import QWidget
 from PySide6.QtGui import QPixmap, QPainter, QPen, QPolygonF, QResizeEvent, QColor
-from PySide6.QtCore import Qt, QRect, QPoint
+from PySide6.QtCore import Qt, QObject, QRect, QRectF, QPoint, QTimer
+from . import panels
+from .panels import AnnotationBatch
 
 class ImageViewer(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self._pixmap = None
-        self._annotations_to_draw = {}
+        self._annotations_to_draw = AnnotationBatch()
+        self._annotations_revision = 0 # Bumped whenever _annotations_to_draw is replaced
         self._selected_rect_index = None
         self.setMinimumSize(400, 300)
+        # paintEvent covers every pixel itself (image plus black letterbox bars).
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+        self.setAttribute(Qt.WA_NoSystemBackground)
 
         self._drawing_offset = QPoint(0, 0)
         self._active_panel = None
@@ -16,48 +23,174 @@ class ImageViewer(QWidget):
         self._annotation_list_widget = None
         
         self._panel_in_transition = None
+        self._transition_connections = [] # Handles to the animating panel's signals
+
+        # Letterbox geometry and scaled copy of the image, each recomputed only when
+        # the widget size or the source pixmap changes. They are cached separately
+        # so that mapping mouse positions never triggers a resample.
+        self._geometry_for_size = None
+        self._geometry_src = None
+        self._scaled_pixmap = None
+        self._scaled_for_size = None
+        self._scaled_src = None
+        self._cached_scaled_size = (0, 0)
+        self._cached_offset = (0, 0)
+        self._cached_scale = (1, 1)
+        self._target_rect = QRect()
+
+        # Cosmetic-width pens for the current zoom, rebuilt only when the scale changes.
+        self._pen_cache = {}
+        self._highlight_cache = (None, None) # (mask, pixmap) for the selected mask
+        self._pen_cache_scale = None
+
+        # While the window is being resized frames are thrown away quickly, so the painter
+        # scales the source directly and the smooth copy is built once resizing settles.
+        self._resizing = False
+        self._resize_timer = QTimer(self)
+        self._resize_timer.setSingleShot(True)
+        self._resize_timer.setInterval(80)
+        self._resize_timer.timeout.connect(self._finish_resize)
+
+        # The annotation list is rebuilt from scratch, so bursts of changes are
+        # collapsed into one rebuild with the latest batch at most every 100 ms.
+        self._pending_list_batch = None
+        self._list_timer = QTimer(self)
+        self._list_timer.setSingleShot(True)
+        self._list_timer.setInterval(100)
+        self._list_timer.timeout.connect(self._flush_annotation_list)
+
+        # Setters and transition callbacks that fire in the same event-loop pass
+        # share one deferred full repaint.
+        self._update_pending = False
+        self._last_paint_sig = None
+
+    def _request_update(self):
+        if not self._update_pending:
+            self._update_pending = True
+            QTimer.singleShot(0, self._do_update)
+
+    def _do_update(self):
+        self._update_pending = False
+        # Requests that ended up changing nothing the last paint depended on are dropped.
+        if self._paint_signature() != self._last_paint_sig:
+            self.update()
+
+    def _paint_signature(self):
+        return (
+            self._pixmap.cacheKey() if self._pixmap else 0,
+            self.width(), self.height(),
+            self._drawing_offset.x(), self._drawing_offset.y(),
+            self._selected_rect_index,
+            self._annotations_revision,
+            self._resizing, self._transitioning,
+        )
 
     def set_annotation_list(self, list_widget):
         self._annotation_list_widget = list_widget
 
+    def _set_list_annotations(self, batch):
+        if not self._annotation_list_widget:
+            return
+        self._pending_list_batch = batch
+        if not self._list_timer.isActive():
+            self._list_timer.start()
+
+    def _flush_annotation_list(self):
+        batch, self._pending_list_batch = self._pending_list_batch, None
+        if batch is not None and self._annotation_list_widget:
+            self._annotation_list_widget.set_annotations(batch)
+
     def update_annotations_display(self):
         if not self._active_panel:
             return
         
         current_annotations = self._active_panel.get_annotations()
-        if self._annotation_list_widget:
-            self._annotation_list_widget.set_annotations(current_annotations)
+        if self._panel_in_transition is None:
+            self._annotations_to_draw = current_annotations
+            self._annotations_revision += 1
+        self._set_list_annotations(current_annotations)
         
-        self.update()
+        self._request_update()
+
+    def refresh_annotations(self):
+        # Connected to every panel's annotations_changed; paintEvent only reads the stash.
+        panel = self._panel_in_transition if self._panel_in_transition else self._active_panel
+        self._annotations_to_draw = panel.get_annotations() if panel else AnnotationBatch()
+        self._annotations_revision += 1
+        self._request_update()
+
+    def refresh_annotations_region(self, image_rect: QRectF):
+        # Connected to every panel's annotations_region_changed.
+        panel = self._panel_in_transition if self._panel_in_transition else self._active_panel
+        self._annotations_to_draw = panel.get_annotations() if panel else AnnotationBatch()
+        self._annotations_revision += 1
+        if not self._pixmap or self._transitioning:
+            self._request_update()
+        else:
+            self.update(self._image_to_widget_rect(image_rect))
 
     def set_image(self, pixmap: QPixmap):
         self._pixmap = pixmap
-        self.update()
+        self._scaled_pixmap = None
+        self._scaled_src = None
+        self._scaled_for_size = None
+        self._geometry_for_size = None
+        self._request_update()
 
     def clear_active_panel(self):
         if self._active_panel:
             self._active_panel.hide()
         self._active_panel = None
         self._transitioning = False
-        self.set_annotations_to_draw({})
-        if self._annotation_list_widget:
-            self._annotation_list_widget.set_annotations({})
+        self.set_annotations_to_draw(AnnotationBatch())
+        self._set_list_annotations(AnnotationBatch())
 
     def set_selected_rect(self, idx):
+        if idx == self._selected_rect_index:
+            return
+        old_rect = self._annotation_widget_rect(self._selected_rect_index)
+        new_rect = self._annotation_widget_rect(idx)
         self._selected_rect_index = idx
-        self.update()
+        # Only the previously and newly selected shapes change colour, so repaint
+        # just their bounds. Masks cover the whole image and fall back to a full update.
+        if old_rect is None or new_rect is None:
+            self._request_update()
+        else:
+            self.update(old_rect.united(new_rect))
+
+    def _annotation_widget_rect(self, idx):
+        if idx is None:
+            return QRect()
+        batch = self._annotations_to_draw
+        if not self._pixmap:
+            return None
+        if 0 <= idx < len(batch.rects):
+            bounds = QRectF(batch.rects[idx])
+        elif 0 <= idx < len(batch.polys):
+            bounds = batch.polys[idx].boundingRect()
+        else:
+            return None
+        return self._image_to_widget_rect(bounds)
+
+    def _image_to_widget_rect(self, bounds: QRectF) -> QRect:
+        self._ensure_geometry()
+        ox, oy = self._cached_offset
+        sx, sy = self._cached_scale
+        bounds = bounds.translated(self._drawing_offset)
+        widget_rect = QRectF(ox + bounds.x() * sx, oy + bounds.y() * sy, bounds.width() * sx, bounds.height() * sy)
+        # Pad by the widest pen used for annotations (3 px in widget space).
+        return widget_rect.toAlignedRect().adjusted(-3, -3, 3, 3)
 
     def set_drawing_offset(self, offset: QPoint):
+        if offset == self._drawing_offset:
+            return
         self._drawing_offset = offset
-        self.update()
+        self._request_update()
 
-    def set_annotations_to_draw(self, annotations):
-        self._annotations_to_draw.clear()
-        if isinstance(annotations, list):
-            self._annotations_to_draw = {'completed': annotations}
-        elif isinstance(annotations, dict):
-            self._annotations_to_draw = annotations
-        self.update()
+    def set_annotations_to_draw(self, batch: AnnotationBatch):
+        self._annotations_to_draw = batch
+        self._annotations_revision += 1
+        self._request_update()
 
     def transition_to(self, new_panel):
         if self._transitioning or self._active_panel is new_panel:
@@ -69,34 +202,27 @@ class ImageViewer(QWidget):
         self._active_panel = new_panel
 
         if old_panel:
-            old_panel.animation_finished.connect(self._start_slide_in)
-            old_panel.moved.connect(self.set_drawing_offset)
+            self._connect_transition(old_panel, self._start_slide_in)
             old_panel.slide_out()
         else:
             self._start_slide_in()
             
     def _start_slide_in(self):
         self._panel_in_transition = None
-        self.set_annotations_to_draw({})
-        if self._annotation_list_widget:
-            self._annotation_list_widget.set_annotations({})
+        new_panel = self._active_panel
+        self.set_annotations_to_draw(new_panel.get_annotations() if new_panel else AnnotationBatch())
+        self._set_list_annotations(AnnotationBatch())
 
-        if self.sender():
-            self.sender().animation_finished.disconnect(self._start_slide_in)
-            self.sender().moved.disconnect(self.set_drawing_offset)
+        self._disconnect_transition()
 
-        new_panel = self._active_panel
         if new_panel:
-            new_panel.animation_finished.connect(self._on_transition_finished)
-            new_panel.moved.connect(self.set_drawing_offset)
+            self._connect_transition(new_panel, self._on_transition_finished)
             new_panel.slide_in()
         else:
             self._on_transition_finished()
 
     def _on_transition_finished(self):
-        if self.sender():
-            self.sender().animation_finished.disconnect(self._on_transition_finished)
-            self.sender().moved.disconnect(self.set_drawing_offset)
+        self._disconnect_transition()
         
         self.set_drawing_offset(QPoint(0, 0))
         self._transitioning = False
@@ -105,87 +231,211 @@ class ImageViewer(QWidget):
         if self._active_panel:
             self._active_panel.setFocus()
 
+    def _connect_transition(self, panel, on_finished):
+        self._transition_connections = [
+            panel.animation_finished.connect(on_finished),
+            panel.moved.connect(self.set_drawing_offset),
+        ]
+
+    def _disconnect_transition(self):
+        for connection in self._transition_connections:
+            QObject.disconnect(connection)
+        self._transition_connections = []
+
+    def _ensure_geometry(self):
+        size = self.size()
+        if self._geometry_for_size == size and self._geometry_src is self._pixmap:
+            return
+        scaled_size = self._pixmap.size().scaled(size, Qt.KeepAspectRatio)
+        sw, sh = scaled_size.width(), scaled_size.height()
+        ox, oy = (size.width() - sw) // 2, (size.height() - sh) // 2
+        self._cached_scaled_size = (sw, sh)
+        self._cached_offset = (ox, oy)
+        self._cached_scale = (
+            sw / self._pixmap.width() if self._pixmap.width() > 0 else 1,
+            sh / self._pixmap.height() if self._pixmap.height() > 0 else 1,
+        )
+        self._target_rect = QRect(ox, oy, sw, sh)
+        self._geometry_for_size = size
+        self._geometry_src = self._pixmap
+
+    def _ensure_scaled(self):
+        # Returns True when _scaled_pixmap matches the current geometry. While resizing
+        # or sliding no cache is built, since it would be thrown away on the next frame.
+        self._ensure_geometry()
+        size = self.size()
+        if self._scaled_for_size == size and self._scaled_src is self._pixmap:
+            return True
+        if self._resizing or self._transitioning:
+            return False
+        self._scaled_pixmap = self._pixmap.scaled(size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        self._scaled_for_size = size
+        self._scaled_src = self._pixmap
+        return True
+
     def resizeEvent(self, event: QResizeEvent):
         super().resizeEvent(event)
+        self._scaled_for_size = None
+        self._geometry_for_size = None
+        self._resizing = True
+        self._resize_timer.start()
         if self._active_panel and self._active_panel.isVisible():
             self._active_panel.setGeometry(self.rect())
 
+    def _finish_resize(self):
+        self._resizing = False
+        self._request_update()
+
     def paintEvent(self, event):
+        # Only a full repaint brings the whole frame up to date; a partial one must not
+        # let _do_update drop a pending full update.
+        if event.rect().contains(self.rect()):
+            self._last_paint_sig = self._paint_signature()
         painter = QPainter(self)
-        painter.fillRect(self.rect(), Qt.black)
-        if not self._pixmap: return
-
-        panel_to_draw = self._panel_in_transition if self._panel_in_transition else self._active_panel
+        if not self._pixmap:
+            painter.fillRect(self.rect(), Qt.black)
+            return
 
-        if panel_to_draw:
-            self._annotations_to_draw = panel_to_draw.get_annotations()
+        if self._pixmap.hasAlphaChannel():
+            painter.fillRect(self.rect(), Qt.black)
+        else:
+            self._ensure_geometry()
+            for bar in self._letterbox_rects():
+                painter.fillRect(bar, Qt.black)
+        if self._ensure_scaled():
+            painter.drawPixmap(self._target_rect.topLeft(), self._scaled_pixmap)
         else:
-            self._annotations_to_draw = {}
+            # Unfiltered painter-side scaling straight from the source, no intermediate pixmap.
+            painter.drawPixmap(self._target_rect, self._pixmap, self._pixmap.rect())
 
-        pixmap_scaled = self._pixmap.scaled(self.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        offset = QPoint((self.width() - pixmap_scaled.width()) // 2, (self.height() - pixmap_scaled.height()) // 2)
-        painter.drawPixmap(offset, pixmap_scaled)
-        
         painter.save()
-        painter.translate(offset)
-        scale_x = pixmap_scaled.width() / self._pixmap.width() if self._pixmap.width() > 0 else 1
-        scale_y = pixmap_scaled.height() / self._pixmap.height() if self._pixmap.height() > 0 else 1
+        painter.translate(*self._cached_offset)
+        scale_x, scale_y = self._cached_scale
         painter.scale(scale_x, scale_y)
         
         painter.translate(self._drawing_offset)
         
-        completed_annotations = self._annotations_to_draw.get('completed', [])
-        
-        for i, annotation in enumerate(completed_annotations):
-            painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
-            if isinstance(annotation, QPixmap):
-                painter.drawPixmap(0, 0, annotation)
-                if i == self._selected_rect_index:
-                    highlight_pixmap = QPixmap(annotation.size())
-                    highlight_pixmap.fill(Qt.transparent)
-                    p = QPainter(highlight_pixmap)
-                    p.drawPixmap(0, 0, annotation)
-                    p.setCompositionMode(QPainter.CompositionMode_SourceIn)
-                    p.fillRect(highlight_pixmap.rect(), QColor(255, 255, 0, 100))
-                    p.end()
-                    painter.drawPixmap(0, 0, highlight_pixmap)
+        batch = self._annotations_to_draw
+        selected = self._selected_rect_index
+        pens = self._pens(max(scale_x, scale_y))
+
+        # Each kind is drawn in one pass with a single pen; the selected shape is
+        # left out of that pass and drawn on its own in yellow.
+        if batch.mask_layer is not None:
+            painter.drawPixmap(0, 0, batch.mask_layer)
+        if selected is not None and 0 <= selected < len(batch.masks):
+            painter.drawPixmap(0, 0, self._highlight_pixmap(batch.masks[selected]))
+
+        rects, polys = batch.rects, batch.polys
+        selected_rect = selected_poly = None
+        if selected is not None and 0 <= selected < len(rects):
+            selected_rect = rects[selected]
+            rects = rects[:selected] + rects[selected + 1:]
+        elif selected is not None and 0 <= selected < len(polys):
+            selected_poly = polys[selected]
+            polys = polys[:selected] + polys[selected + 1:]
+
+        dirty = self._dirty_image_rect(event.rect())
+        if dirty is not None:
+            # Partial update: only send shapes that touch the exposed area to the painter.
+            rects = [rect for rect in rects if dirty.intersects(QRectF(rect))]
+            polys = [poly for poly in polys if dirty.intersects(poly.boundingRect())]
+
+        painter.setPen(pens['red2'])
+        if rects:
+            painter.drawRects(rects)
+        for poly in polys:
+            painter.drawPolygon(poly)
+
+        if selected_rect is not None or selected_poly is not None:
+            painter.setPen(pens['yellow3'])
+            if selected_rect is not None:
+                painter.drawRect(selected_rect)
             else:
-                pen_width = 3 if i == self._selected_rect_index else 2
-                pen_color = Qt.yellow if i == self._selected_rect_index else Qt.red
-                pen = QPen(pen_color, pen_width / max(scale_x, scale_y))
-                painter.setPen(pen)
-                if isinstance(annotation, QRect):
-                    painter.drawRect(annotation)
-                elif isinstance(annotation, list) and annotation:
-                    painter.drawPolygon(QPolygonF(annotation))
+                painter.drawPolygon(selected_poly)
         
-        active_annotation = self._annotations_to_draw.get('active')
-        pen = QPen(Qt.cyan, 2 / max(scale_x, scale_y))
-        painter.setPen(pen)
+        active_annotation = batch.active
+        painter.setPen(pens['cyan2'])
 
         if isinstance(active_annotation, QPixmap):
             painter.drawPixmap(0, 0, active_annotation)
         elif isinstance(active_annotation, QRect):
             painter.drawRect(active_annotation)
-        elif isinstance(active_annotation, list) and active_annotation:
+        elif isinstance(active_annotation, QPolygonF) and not active_annotation.isEmpty():
             painter.drawPoints(active_annotation)
-            if len(active_annotation) > 1:
-                painter.drawPolyline(QPolygonF(active_annotation))
-            cursor_pos = self._annotations_to_draw.get('cursor_pos')
-            if cursor_pos:
-                painter.drawLine(active_annotation[-1], cursor_pos)
+            if active_annotation.size() > 1:
+                painter.drawPolyline(active_annotation)
+            if batch.cursor_pos is not None:
+                painter.drawLine(active_annotation.last(), batch.cursor_pos)
 
         painter.restore()
             
+    def image_scale(self):
+        # (offset, sx, sy) such that image = (widget - offset) * s, for panels that map many points.
+        if not self._pixmap: return None
+        self._ensure_geometry()
+        scale_x, scale_y = self._cached_scale
+        return QPoint(*self._cached_offset), 1 / scale_x, 1 / scale_y
+
+    def image_size(self):
+        return self._pixmap.size() if self._pixmap else None
+
+    def _letterbox_rects(self):
+        w, h = self.width(), self.height()
+        t = self._target_rect
+        bars = (
+            QRect(0, 0, t.left(), h),
+            QRect(t.right() + 1, 0, w - t.right() - 1, h),
+            QRect(t.left(), 0, t.width(), t.top()),
+            QRect(t.left(), t.bottom() + 1, t.width(), h - t.bottom() - 1),
+        )
+        return [bar for bar in bars if not bar.isEmpty()]
+
+    def _pens(self, scale):
+        if scale != self._pen_cache_scale:
+            self._pen_cache = {
+                'red2': QPen(Qt.red, 2 / scale),
+                'yellow3': QPen(Qt.yellow, 3 / scale),
+                'cyan2': QPen(Qt.cyan, 2 / scale),
+            }
+            self._pen_cache_scale = scale
+        return self._pen_cache
+
+    def _dirty_image_rect(self, widget_rect: QRect):
+        # The exposed widget area in annotation coordinates, or None when it covers the whole image.
+        if widget_rect.contains(self._target_rect):
+            return None
+        ox, oy = self._cached_offset
+        sx, sy = self._cached_scale
+        pad = 3 # Widest annotation pen, in widget pixels
+        dirty = QRectF((widget_rect.x() - ox - pad) / sx, (widget_rect.y() - oy - pad) / sy,
+                       (widget_rect.width() + 2 * pad) / sx, (widget_rect.height() + 2 * pad) / sy)
+        return dirty.translated(-self._drawing_offset.x(), -self._drawing_offset.y())
+
+    def _highlight_pixmap(self, mask) -> QPixmap:
+        # Completed masks are never drawn on again, so the entry's identity is a stable key.
+        cached_mask, highlight_pixmap = self._highlight_cache
+        if cached_mask is not mask:
+            highlight_pixmap = panels.mask_to_pixmap(panels.decode_mask(mask), QColor(255, 255, 0, 100))
+            self._highlight_cache = (mask, highlight_pixmap)
+        return highlight_pixmap
+
+    def map_many_to_image(self, points: np.ndarray) -> np.ndarray:
+        # Vectorised map_to_image for an (N, 2) array of widget points; points outside the image are dropped.
+        if not self._pixmap: return np.empty((0, 2), dtype=np.int32)
+        self._ensure_geometry()
+        sw, sh = self._cached_scaled_size
+        rel = points - np.asarray(self._cached_offset)
+        inside = (rel[:, 0] >= 0) & (rel[:, 0] < sw) & (rel[:, 1] >= 0) & (rel[:, 1] < sh)
+        return (rel[inside] * (self._pixmap.width() / sw, self._pixmap.height() / sh)).astype(np.int32)
+
     def map_to_image(self, widget_point: QPoint):
         if not self._pixmap: return None
-        pixmap_scaled = self._pixmap.scaled(self.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        offset_x = (self.width() - pixmap_scaled.width()) // 2
-        offset_y = (self.height() - pixmap_scaled.height()) // 2
-        if not QRect(offset_x, offset_y, pixmap_scaled.width(), pixmap_scaled.height()).contains(widget_point):
+        self._ensure_geometry()
+        ox, oy = self._cached_offset
+        sw, sh = self._cached_scaled_size
+        x = widget_point.x() - ox
+        y = widget_point.y() - oy
+        if not (0 <= x < sw and 0 <= y < sh):
             return None
-        x = widget_point.x() - offset_x
-        y = widget_point.y() - offset_y
-        scale_x = self._pixmap.width() / pixmap_scaled.width() if pixmap_scaled.width() > 0 else 1
-        scale_y = self._pixmap.height() / pixmap_scaled.height() if pixmap_scaled.height() > 0 else 1
-        return QPoint(int(x * scale_x), int(y * scale_y))
\ No newline at end of file
+        return QPoint(int(x * self._pixmap.width() / sw), int(y * self._pixmap.height() / sh))
\ No newline at end of file
@@ -1,12 +1,48 @@
+import os
+from contextlib import contextmanager
+
 from PySide6.QtWidgets import (
-    QMainWindow, QStatusBar, QDockWidget, QFileDialog, QMessageBox, QToolBar
+    QMainWindow, QStatusBar, QDockWidget, QFileDialog, QMessageBox, QToolBar, QProgressDialog
 )
-from PySide6.QtCore import Qt, QRect, QSize
-from PySide6.QtGui import QAction, QIcon, QActionGroup, QColor, QPixmap, QPainter, QFont
+from PySide6.QtCore import Qt, QRect, QSize, QSettings, QObject, QRunnable, QThreadPool, QTimer, Signal
+from PySide6.QtGui import QAction, QIcon, QActionGroup, QColor, QImage, QPixmap, QPixmapCache, QPainter, QFont
 from .image_viewer import ImageViewer
 from .annotation_list import AnnotationList
 from .class_list import ClassList
-from .panels import BoundingBoxPanel, PolygonPanel, MaskPanel, KeypointsPanel
+from . import panels
+
+# Mode colours, shared by the panel ribbons and the toolbar icons.
+BBOX_COLOR = QColor("deepskyblue")
+POLYGON_COLOR = QColor("mediumseagreen")
+MASK_COLOR = QColor("gold")
+KEYPOINTS_COLOR = QColor("orange")
+TOOL_ICON_COLOR = QColor(210, 210, 210)
+
+@contextmanager
+def _batched_updates(widget):
+    # Invalidations made inside the block are collapsed into one repaint on exit.
+    widget.setUpdatesEnabled(False)
+    try:
+        yield
+    finally:
+        widget.setUpdatesEnabled(True)
+        widget.update()
+
+class _ImageLoadSignals(QObject):
+    loaded = Signal(QImage)
+
+class _ImageLoadTask(QRunnable):
+    # Decodes into a QImage, which unlike QPixmap may be created off the GUI thread.
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.cancelled = False
+        self.signals = _ImageLoadSignals()
+
+    def run(self):
+        image = QImage(self.path)
+        if not self.cancelled:
+            self.signals.loaded.emit(image)
 
 class XLabelMainWindow(QMainWindow):
     def __init__(self):
@@ -17,20 +53,22 @@ class XLabelMainWindow(QMainWindow):
         self.image_viewer = ImageViewer(self)
         self.setCentralWidget(self.image_viewer)
         
-        self.bbox_panel = BoundingBoxPanel(self.image_viewer)
-        self.bbox_panel.set_ribbon_color(QColor("deepskyblue"))
-        self.bbox_panel.new_annotation.connect(self._on_new_annotation)
-
-        self.polygon_panel = PolygonPanel(self.image_viewer)
-        self.polygon_panel.set_ribbon_color(QColor("mediumseagreen"))
-        self.polygon_panel.new_annotation.connect(self._on_new_annotation)
-        
-        self.mask_panel = MaskPanel(self.image_viewer)
-        self.mask_panel.set_ribbon_color(QColor("gold"))
-        self.mask_panel.new_annotation.connect(self._on_new_annotation)
-
-        self.keypoints_panel = KeypointsPanel(self.image_viewer)
-        self.keypoints_panel.set_ribbon_color(QColor("orange"))
+        # Panels are built on first activation; the mask panel in particular
+        # allocates an image-sized overlay that most sessions never need.
+        self._panel_factories = {
+            'bbox': ('BoundingBoxPanel', BBOX_COLOR),
+            'polygon': ('PolygonPanel', POLYGON_COLOR),
+            'mask': ('MaskPanel', MASK_COLOR),
+            'keypoints': ('KeypointsPanel', KEYPOINTS_COLOR),
+        }
+        self._panels = {}
+
+        self._load_task = None
+        self._load_progress = None
+        self._load_progress_timer = QTimer(self)
+        self._load_progress_timer.setSingleShot(True)
+        self._load_progress_timer.setInterval(200)
+        self._load_progress_timer.timeout.connect(self._show_load_progress)
 
         self.annotation_list = AnnotationList(self)
         self.annotations_dock = QDockWidget("Annotations", self)
@@ -51,11 +89,24 @@ class XLabelMainWindow(QMainWindow):
         self.annotation_list.annotation_selected.connect(self.image_viewer.set_selected_rect)
         self.annotation_list.annotation_deleted.connect(self._on_delete_annotation)
 
+    def _get_panel(self, name):
+        panel = self._panels.get(name)
+        if panel is None:
+            class_name, color = self._panel_factories[name]
+            panel = getattr(panels, class_name)(self.image_viewer)
+            panel.set_ribbon_color(color)
+            if hasattr(panel, 'new_annotation'):
+                panel.new_annotation.connect(self._on_new_annotation)
+            panel.annotations_changed.connect(self.image_viewer.refresh_annotations)
+            panel.annotations_region_changed.connect(self.image_viewer.refresh_annotations_region)
+            self._panels[name] = panel
+        return panel
+
     def _set_active_mode(self, panel):
         for action in self.contextual_actions:
             action.setVisible(False)
 
-        if isinstance(panel, MaskPanel):
+        if panel is self._panels.get('mask'):
             self.brush_action.setVisible(True)
             self.eraser_action.setVisible(True)
 
@@ -69,11 +120,11 @@ class XLabelMainWindow(QMainWindow):
             return
         
         status_message = "Annotation added."
-        if isinstance(active_panel, MaskPanel):
+        if active_panel is self._panels.get('mask'):
             status_message = "Mask completed and added to list."
-        elif isinstance(active_panel, BoundingBoxPanel):
+        elif active_panel is self._panels.get('bbox'):
             status_message = "Bounding Box added to list."
-        elif isinstance(active_panel, PolygonPanel):
+        elif active_panel is self._panels.get('polygon'):
             status_message = "Polygon added to list."
         
         self.statusBar().showMessage(status_message, 3000)
@@ -84,24 +135,59 @@ class XLabelMainWindow(QMainWindow):
         if active_panel and hasattr(active_panel, 'delete_annotation'):
             if active_panel.delete_annotation(index):
                 self.statusBar().showMessage(f"Annotation {index + 1} deleted.", 3000)
-                self.image_viewer.set_selected_rect(None)
-                self.image_viewer.update_annotations_display()
+                with _batched_updates(self.image_viewer):
+                    self.image_viewer.set_selected_rect(None)
+                    self.image_viewer.update_annotations_display()
 
     def _open_file(self):
-        file_name, _ = QFileDialog.getOpenFileName(self, "Open XLabel PNG", "", "PNG Images (*.png)")
-        if not file_name: return
-        pixmap = QPixmap(file_name)
-        if pixmap.isNull():
+        settings = QSettings("XLabel", "gui")
+        dialog = QFileDialog(self, "Open XLabel PNG", settings.value("last_dir", ""), "PNG Images (*.png)")
+        dialog.setOptions(QFileDialog.Option.DontUseNativeDialog | QFileDialog.Option.DontResolveSymlinks)
+        dialog.setFileMode(QFileDialog.FileMode.ExistingFile)
+        if not dialog.exec(): return
+        file_name = dialog.selectedFiles()[0]
+        settings.setValue("last_dir", os.path.dirname(file_name))
+
+        self._stop_load()
+        task = _ImageLoadTask(file_name)
+        task.signals.loaded.connect(lambda image: self._on_image_loaded(task, image))
+        self._load_task = task
+        self._load_progress_timer.start()
+        QThreadPool.globalInstance().start(task)
+
+    def _show_load_progress(self):
+        if self._load_task is None: return
+        self._load_progress = QProgressDialog("Loading image...", "Cancel", 0, 0, self)
+        self._load_progress.setWindowModality(Qt.WindowModal)
+        self._load_progress.canceled.connect(self._stop_load)
+        self._load_progress.show()
+
+    def _stop_load(self):
+        if self._load_task is not None:
+            self._load_task.cancelled = True
+            self._load_task = None
+        self._load_progress_timer.stop()
+        if self._load_progress is not None:
+            self._load_progress.canceled.disconnect(self._stop_load)
+            self._load_progress.close()
+            self._load_progress = None
+
+    def _on_image_loaded(self, task, image):
+        if task is not self._load_task:
+            return
+        self._stop_load()
+        file_name = task.path
+        if image.isNull():
             QMessageBox.warning(self, "Open Error", "Failed to load image.")
             return
+        pixmap = QPixmap.fromImage(image)
 
-        self.bbox_panel.clear_annotations()
-        self.polygon_panel.clear_annotations()
-        self.mask_panel.clear_annotations()
-        self.keypoints_panel.clear_annotations()
+        with _batched_updates(self.image_viewer):
+            for panel in self._panels.values():
+                panel.clear_annotations()
 
-        self.image_viewer.set_image(pixmap)
-        self.image_viewer.clear_active_panel()
+            self.image_viewer.set_image(pixmap)
+            self.image_viewer.clear_active_panel()
         
         for action in self.mode_actions:
             action.setEnabled(True)
@@ -109,6 +195,11 @@ class XLabelMainWindow(QMainWindow):
         self.statusBar().showMessage(f"Loaded {file_name}")
 
     def _create_colored_icon(self, color: QColor, text:str = "", size=QSize(32, 32)) -> QIcon:
+        key = f"xlabel_icon_{color.rgba():08x}_{text}_{size.width()}x{size.height()}"
+        pixmap = QPixmapCache.find(key)
+        if pixmap is not None and not pixmap.isNull():
+            return QIcon(pixmap)
+
         pixmap = QPixmap(size)
         pixmap.fill(Qt.transparent)
         painter = QPainter(pixmap)
@@ -128,6 +219,7 @@ class XLabelMainWindow(QMainWindow):
             painter.drawText(pixmap.rect(), Qt.AlignCenter, text)
 
         painter.end()
+        QPixmapCache.insert(key, pixmap)
         return QIcon(pixmap)
     
     def _create_menu(self):
@@ -161,30 +253,30 @@ class XLabelMainWindow(QMainWindow):
         
         self.mode_actions = []
 
-        bbox_action = QAction(self._create_colored_icon(QColor("deepskyblue")), "Bounding Box (B)", self)
+        bbox_action = QAction(self._create_colored_icon(BBOX_COLOR), "Bounding Box (B)", self)
         bbox_action.setCheckable(True)
-        bbox_action.triggered.connect(lambda: self._set_active_mode(self.bbox_panel))
+        bbox_action.triggered.connect(lambda: self._set_active_mode(self._get_panel('bbox')))
         mode_toolbar.addAction(bbox_action)
         mode_group.addAction(bbox_action)
         self.mode_actions.append(bbox_action)
 
-        polygon_action = QAction(self._create_colored_icon(QColor("mediumseagreen")), "Polygon (P)", self)
+        polygon_action = QAction(self._create_colored_icon(POLYGON_COLOR), "Polygon (P)", self)
         polygon_action.setCheckable(True)
-        polygon_action.triggered.connect(lambda: self._set_active_mode(self.polygon_panel))
+        polygon_action.triggered.connect(lambda: self._set_active_mode(self._get_panel('polygon')))
         mode_toolbar.addAction(polygon_action)
         mode_group.addAction(polygon_action)
         self.mode_actions.append(polygon_action)
 
-        mask_action = QAction(self._create_colored_icon(QColor("gold")), "Mask (M)", self)
+        mask_action = QAction(self._create_colored_icon(MASK_COLOR), "Mask (M)", self)
         mask_action.setCheckable(True)
-        mask_action.triggered.connect(lambda: self._set_active_mode(self.mask_panel))
+        mask_action.triggered.connect(lambda: self._set_active_mode(self._get_panel('mask')))
         mode_toolbar.addAction(mask_action)
         mode_group.addAction(mask_action)
         self.mode_actions.append(mask_action)
 
-        keypoints_action = QAction(self._create_colored_icon(QColor("orange")), "Keypoints (K)", self)
+        keypoints_action = QAction(self._create_colored_icon(KEYPOINTS_COLOR), "Keypoints (K)", self)
         keypoints_action.setCheckable(True)
-        keypoints_action.triggered.connect(lambda: self._set_active_mode(self.keypoints_panel))
+        keypoints_action.triggered.connect(lambda: self._set_active_mode(self._get_panel('keypoints')))
         mode_toolbar.addAction(keypoints_action)
         mode_group.addAction(keypoints_action)
         self.mode_actions.append(keypoints_action)
@@ -198,17 +290,17 @@ class XLabelMainWindow(QMainWindow):
         mask_tool_group = QActionGroup(self)
         mask_tool_group.setExclusive(True)
 
-        self.brush_action = QAction(self._create_colored_icon(QColor(210, 210, 210), "B"), "Brush", self)
+        self.brush_action = QAction(self._create_colored_icon(TOOL_ICON_COLOR, "B"), "Brush", self)
         self.brush_action.setCheckable(True)
         self.brush_action.setChecked(True)
-        self.brush_action.triggered.connect(self.mask_panel.set_brush_mode)
+        self.brush_action.triggered.connect(lambda: self._get_panel('mask').set_brush_mode())
         mode_toolbar.addAction(self.brush_action)
         mask_tool_group.addAction(self.brush_action)
         self.contextual_actions.append(self.brush_action)
 
-        self.eraser_action = QAction(self._create_colored_icon(QColor(210, 210, 210), "E"), "Eraser", self)
+        self.eraser_action = QAction(self._create_colored_icon(TOOL_ICON_COLOR, "E"), "Eraser", self)
         self.eraser_action.setCheckable(True)
-        self.eraser_action.triggered.connect(self.mask_panel.set_eraser_mode)
+        self.eraser_action.triggered.connect(lambda: self._get_panel('mask').set_eraser_mode())
         mode_toolbar.addAction(self.eraser_action)
         mask_tool_group.addAction(self.eraser_action)
         self.contextual_actions.append(self.eraser_action)
@@ -1,8 +1,28 @@
 # __init__.py for panels module
 
-# Expose all panel classes so they can be imported from this package
-from .base_panel import BasePanel
-from .bbox_panel import BoundingBoxPanel
-from .polygon_panel import PolygonPanel
-from .mask_panel import MaskPanel
-from .keypoints_panel import KeypointsPanel
\ No newline at end of file
+# Expose all panel classes so they can be imported from this package. Each module
+# is only imported on first access (PEP 562), so e.g. the mask panel's OpenCV
+# import is not paid until mask mode is used.
+import importlib
+
+_lazy = {
+    "BasePanel": "base_panel",
+    "AnnotationBatch": "base_panel",
+    "BoundingBoxPanel": "bbox_panel",
+    "PolygonPanel": "polygon_panel",
+    "MaskPanel": "mask_panel",
+    "MaskRLE": "mask_panel",
+    "decode_mask": "mask_panel",
+    "mask_to_pixmap": "mask_panel",
+    "KeypointsPanel": "keypoints_panel",
+}
+
+__all__ = list(_lazy)
+
+def __getattr__(name):
+    module_name = _lazy.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
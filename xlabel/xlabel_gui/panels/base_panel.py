@@ -1,13 +1,26 @@
+from collections import namedtuple
 from PySide6.QtWidgets import QWidget
 from PySide6.QtCore import (
-    QPropertyAnimation, QEasingCurve, QRect, Property, Signal, QPoint, 
-    QSequentialAnimationGroup
+    QPropertyAnimation, QVariantAnimation, QEasingCurve, QRect, QRectF, Signal, QPoint, 
+    QSequentialAnimationGroup, QTimer
 )
-from PySide6.QtGui import QColor, QMoveEvent, QPainter
+from PySide6.QtGui import QColor, QMoveEvent, QPainter, QPixmap
+
+class AnnotationBatch(namedtuple("AnnotationBatch", ["rects", "polys", "masks", "active", "cursor_pos", "mask_layer"],
+                                 defaults=((), (), (), None, None, None))):
+    """
+    A panel's annotations split by kind, so the viewer can draw each kind in one pass.
+    masks are MaskRLE entries; mask_layer is all of them composited into a single pixmap.
+    """
+    __slots__ = ()
 
 class BasePanel(QWidget):
     moved = Signal(QPoint)
     animation_finished = Signal()
+    # Emitted whenever get_annotations() would return something new, including the active shape.
+    annotations_changed = Signal()
+    # As annotations_changed, but nothing outside this image-space rect looks different.
+    annotations_region_changed = Signal(QRectF)
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -19,25 +32,70 @@ class BasePanel(QWidget):
         
         self.sliding_background_color = QColor(80, 80, 80, 38)
         self.final_background_color = QColor(80, 80, 80, 8)
-        self._background_color = self.final_background_color
-
-        self.slide_anim = QPropertyAnimation(self, b"geometry")
-        self.slide_anim.setDuration(700)
-        self.slide_anim.setEasingCurve(QEasingCurve.OutCubic)
-
-        self.fade_in_anim = QPropertyAnimation(self, b"background")
-        self.fade_in_anim.setDuration(400)
-        
-        self.fade_out_anim = QPropertyAnimation(self, b"background")
-        self.fade_out_anim.setDuration(200)
+        # The background is cached at the sliding colour and faded via painter opacity,
+        # so the cached pixmap stays valid for the whole animation.
+        self._final_opacity = self.final_background_color.alphaF() / self.sliding_background_color.alphaF()
+        self._background_opacity = self._final_opacity
+
+        # Both groups are built once; an animation can only belong to one group,
+        # so each direction has its own slide and fade.
+        self._slide_in_anim = self._make_slide_anim()
+        self._fade_in_anim = self._make_fade_anim(400)
+        self._in_group = QSequentialAnimationGroup(self)
+        self._in_group.addAnimation(self._slide_in_anim)
+        self._in_group.addAnimation(self._fade_in_anim)
+        self._in_group.finished.connect(self.animation_finished)
+
+        self._fade_out_anim = self._make_fade_anim(200)
+        self._slide_out_anim = self._make_slide_anim()
+        self._out_group = QSequentialAnimationGroup(self)
+        self._out_group.addAnimation(self._fade_out_anim)
+        self._out_group.addAnimation(self._slide_out_anim)
+        self._out_group.finished.connect(self.hide)
+        self._out_group.finished.connect(self.animation_finished)
 
         self.current_anim_group = None
 
-    def _get_background_color(self): return self._background_color
-    def _set_background_color(self, color: QColor):
-        self._background_color = color
+        # Mouse moves only schedule a repaint; the viewer is told at most once per ~16 ms.
+        self._repaint_timer = QTimer(self)
+        self._repaint_timer.setSingleShot(True)
+        self._repaint_timer.setInterval(16)
+        self._repaint_timer.timeout.connect(self._flush_repaint)
+        self._dirty_rect = None # Image-space union of scheduled changes; None means everything
+
+        # Background pre-rendered once and blitted on every paint.
+        self._bg_cache = None
+        self._bg_cache_key = None
+
+    def _make_slide_anim(self):
+        anim = QPropertyAnimation(self, b"geometry")
+        anim.setDuration(700)
+        anim.setEasingCurve(QEasingCurve.OutCubic)
+        return anim
+
+    def _make_fade_anim(self, duration):
+        anim = QVariantAnimation(self)
+        anim.setDuration(duration)
+        anim.valueChanged.connect(self._on_opacity_changed)
+        return anim
+
+    def _on_opacity_changed(self, opacity):
+        self._background_opacity = opacity
         self.update()
-    background = Property(QColor, _get_background_color, _set_background_color)
+
+    def _schedule_repaint(self, dirty_rect=None):
+        if not self._repaint_timer.isActive():
+            self._dirty_rect = dirty_rect
+            self._repaint_timer.start()
+        elif self._dirty_rect is not None:
+            self._dirty_rect = self._dirty_rect.united(dirty_rect) if dirty_rect is not None else None
+
+    def _flush_repaint(self):
+        dirty_rect, self._dirty_rect = self._dirty_rect, None
+        if dirty_rect is None:
+            self.annotations_changed.emit()
+        else:
+            self.annotations_region_changed.emit(dirty_rect)
 
     def paintEvent(self, event):
         """
@@ -48,21 +106,37 @@ class BasePanel(QWidget):
         its animations and events unreliably.
         """
         super().paintEvent(event)
+        background_visible = self._background_opacity * self.sliding_background_color.alpha() >= 1
+        ribbon_visible = self.ribbon_color.isValid() and self.ribbon_color.alpha() > 0
+        if not background_visible and not ribbon_visible:
+            return
         painter = QPainter(self)
-        
+
         # Draw the semi-transparent background that fades in/out
-        painter.fillRect(self.rect(), self._background_color)
-        
+        if background_visible:
+            painter.setOpacity(self._background_opacity)
+            painter.drawPixmap(0, 0, self._background_pixmap())
+            painter.setOpacity(1.0)
+
         # Draw the colored ribbon on the left edge
-        if self.ribbon_color.isValid():
+        if ribbon_visible:
             painter.fillRect(0, 0, self.ribbon_width, self.height(), self.ribbon_color)
 
+    def _background_pixmap(self):
+        key = (self.width(), self.height(), self.sliding_background_color.rgba())
+        if key != self._bg_cache_key:
+            self._bg_cache = QPixmap(self.size())
+            self._bg_cache.fill(self.sliding_background_color)
+            self._bg_cache_key = key
+        return self._bg_cache
+
     def moveEvent(self, event: QMoveEvent):
         super().moveEvent(event)
         self.moved.emit(self.pos())
 
     def set_ribbon_color(self, color: QColor):
         self.ribbon_color = color
+        self.update()
 
     def slide_in(self):
         if self.isVisible():
@@ -74,19 +148,17 @@ class BasePanel(QWidget):
         end_geom = parent_rect
 
         self.setGeometry(start_geom)
-        self.background = self.sliding_background_color
+        self._background_opacity = 1.0
         self.show()
 
-        self.slide_anim.setStartValue(start_geom)
-        self.slide_anim.setEndValue(end_geom)
-        self.fade_in_anim.setStartValue(self.sliding_background_color)
-        self.fade_in_anim.setEndValue(self.final_background_color)
+        self._slide_in_anim.setStartValue(start_geom)
+        self._slide_in_anim.setEndValue(end_geom)
+        self._fade_in_anim.setStartValue(1.0)
+        self._fade_in_anim.setEndValue(self._final_opacity)
 
-        self.current_anim_group = QSequentialAnimationGroup(self)
-        self.current_anim_group.addAnimation(self.slide_anim)
-        self.current_anim_group.addAnimation(self.fade_in_anim)
-        self.current_anim_group.finished.connect(self.animation_finished)
-        self.current_anim_group.start()
+        self._out_group.stop()
+        self.current_anim_group = self._in_group
+        self._in_group.start()
 
     def slide_out(self):
         if not self.isVisible():
@@ -97,14 +169,11 @@ class BasePanel(QWidget):
         start_geom = self.geometry()
         end_geom = QRect(parent_rect.width(), 0, self.width(), self.height())
         
-        self.fade_out_anim.setStartValue(self._background_color)
-        self.fade_out_anim.setEndValue(self.sliding_background_color)
-        self.slide_anim.setStartValue(start_geom)
-        self.slide_anim.setEndValue(end_geom)
-
-        self.current_anim_group = QSequentialAnimationGroup(self)
-        self.current_anim_group.addAnimation(self.fade_out_anim)
-        self.current_anim_group.addAnimation(self.slide_anim)
-        self.current_anim_group.finished.connect(self.hide)
-        self.current_anim_group.finished.connect(self.animation_finished)
-        self.current_anim_group.start()
\ No newline at end of file
+        self._fade_out_anim.setStartValue(self._background_opacity)
+        self._fade_out_anim.setEndValue(1.0)
+        self._slide_out_anim.setStartValue(start_geom)
+        self._slide_out_anim.setEndValue(end_geom)
+
+        self._in_group.stop()
+        self.current_anim_group = self._out_group
+        self._out_group.start()
\ No newline at end of file
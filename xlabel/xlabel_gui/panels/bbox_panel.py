@@ -1,6 +1,6 @@
-from PySide6.QtCore import Signal, QPoint, QRect, Qt
+from PySide6.QtCore import Signal, QRect, QRectF, Qt
 from PySide6.QtGui import QKeyEvent
-from .base_panel import BasePanel
+from .base_panel import BasePanel, AnnotationBatch
 
 class BoundingBoxPanel(BasePanel):
     # --- THE FIX: The signal no longer needs to carry data ---
@@ -12,13 +12,15 @@ class BoundingBoxPanel(BasePanel):
         self._is_drawing = False
         self._start_pos = None
         self._current_rect = None
+        # Plain ints for the drag's hot path: start point, image clamp and the
+        # current rect's inclusive corners.
+        self._start_x = self._start_y = 0
+        self._max_x = self._max_y = 0
+        self._current_corners = (0, 0, 0, 0)
         self.setFocusPolicy(Qt.StrongFocus)
 
     def get_annotations(self):
-        return {
-            "completed": self._annotations,
-            "active": self._current_rect
-        }
+        return AnnotationBatch(rects=self._annotations, active=self._current_rect)
 
     def delete_annotation(self, index):
         if 0 <= index < len(self._annotations):
@@ -29,8 +31,7 @@ class BoundingBoxPanel(BasePanel):
     def clear_annotations(self):
         self._annotations.clear()
         self._current_rect = None
-        if self.parent():
-            self.parent().update()
+        self.annotations_changed.emit()
 
     def mousePressEvent(self, event):
         image_pos = self.parent().map_to_image(event.pos())
@@ -38,21 +39,39 @@ class BoundingBoxPanel(BasePanel):
         if event.button() == Qt.LeftButton:
             self._is_drawing = True
             self._start_pos = image_pos
+            self._start_x, self._start_y = image_pos.x(), image_pos.y()
+            image_size = self.parent().image_size()
+            self._max_x, self._max_y = image_size.width() - 1, image_size.height() - 1
+            # Nothing visible yet; the first move schedules the repaint.
             self._current_rect = QRect(self._start_pos, self._start_pos)
-            self.parent().update()
+            self._current_corners = (self._start_x, self._start_y, self._start_x, self._start_y)
 
     def mouseMoveEvent(self, event):
         if not self._is_drawing: return
-        image_pos = self.parent().map_to_image(event.pos())
-        if not image_pos: return
-        self._current_rect = QRect(self._start_pos, image_pos).normalized()
-        self.parent().update()
+        scale = self.parent().image_scale()
+        if not scale: return
+        # The drag started inside the image, so transform directly and clamp to its
+        # bounds instead of going through map_to_image's hit test.
+        offset, sx, sy = scale
+        pos = event.pos()
+        x = min(max(int((pos.x() - offset.x()) * sx), 0), self._max_x)
+        y = min(max(int((pos.y() - offset.y()) * sy), 0), self._max_y)
+        # Same as QRect(start, pos).normalized(), without the round trips through Qt.
+        x0, x1 = (self._start_x, x) if self._start_x <= x else (x, self._start_x)
+        y0, y1 = (self._start_y, y) if self._start_y <= y else (y, self._start_y)
+        self._current_rect = QRect(x0, y0, x1 - x0 + 1, y1 - y0 + 1)
+        # Only the old and new rubber band need repainting.
+        ox0, oy0, ox1, oy1 = self._current_corners
+        self._current_corners = (x0, y0, x1, y1)
+        dx0, dy0 = min(x0, ox0), min(y0, oy0)
+        self._schedule_repaint(QRectF(dx0, dy0, max(x1, ox1) - dx0 + 1, max(y1, oy1) - dy0 + 1))
 
     def mouseReleaseEvent(self, event):
         if not self._is_drawing or event.button() != Qt.LeftButton:
             return
         
         self._is_drawing = False
+        self._repaint_timer.stop()
         if self._current_rect and self._current_rect.width() > 3 and self._current_rect.height() > 3:
             # --- THE FIX: Add the annotation directly and emit the simple signal ---
             self._annotations.append(self._current_rect)
@@ -60,4 +79,4 @@ class BoundingBoxPanel(BasePanel):
             self.new_annotation.emit()
         else:
             self._current_rect = None
-            self.parent().update()
\ No newline at end of file
+            self.annotations_changed.emit()
\ No newline at end of file
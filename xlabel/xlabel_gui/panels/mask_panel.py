@@ -1,6 +1,40 @@
-from PySide6.QtCore import Signal, QPoint, Qt
-from PySide6.QtGui import QPixmap, QPainter, QPen, QColor, QKeyEvent
-from .base_panel import BasePanel
+import functools
+from collections import namedtuple
+import cv2
+import numpy as np
+from PySide6.QtCore import Signal, Qt, QTimer
+from PySide6.QtGui import QImage, QPixmap, QPainter, QColor, QKeyEvent
+from .base_panel import BasePanel, AnnotationBatch
+
+# A completed mask, run-length encoded COCO-style: alternating runs of 0 and 255 over
+# the row-major pixels, starting with 0. counts holds the run lengths as uint32 bytes.
+MaskRLE = namedtuple("MaskRLE", ["size", "counts"])
+
+def encode_mask(mask: np.ndarray) -> MaskRLE:
+    flat = mask.ravel() != 0
+    edges = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    counts = np.diff(np.concatenate(([0], edges, [flat.size])))
+    if flat[0]:
+        counts = np.concatenate(([0], counts))
+    return MaskRLE(mask.shape, counts.astype(np.uint32).tobytes())
+
+@functools.lru_cache(maxsize=8)
+def decode_mask(rle: MaskRLE) -> np.ndarray:
+    # Cached and shared between callers, so the result must not be modified.
+    counts = np.frombuffer(rle.counts, dtype=np.uint32)
+    values = np.zeros(len(counts), dtype=np.uint8)
+    values[1::2] = 255
+    return np.repeat(values, counts).reshape(rle.size)
+
+def mask_to_image(mask: np.ndarray, color: QColor) -> QImage:
+    # Wraps the mask's buffer without copying, so mask must outlive the returned image.
+    h, w = mask.shape
+    image = QImage(mask.data, w, h, mask.strides[0], QImage.Format_Indexed8)
+    image.setColorTable([0] + [color.rgba()] * 255)
+    return image
+
+def mask_to_pixmap(mask: np.ndarray, color: QColor) -> QPixmap:
+    return QPixmap.fromImage(mask_to_image(mask, color))
 
 class MaskPanel(BasePanel):
     """A panel for creating and managing pixel-mask annotations."""
@@ -8,15 +42,29 @@ class MaskPanel(BasePanel):
 
     def __init__(self, parent=None):
         super().__init__(parent)
+        # The active mask is a single-channel uint8 array (0 or 255) in image coordinates;
+        # completed ones are stored as MaskRLE and decoded on demand. Only the active
+        # mask and the composite of completed ones are kept as pixmaps.
         self._annotations = []
         self._active_mask = None
+        self._active_pixmap = None # Display copy of _active_mask, updated per stroke region
+        self._composite_pixmap = None # All completed masks in one layer, rebuilt lazily
         self._is_drawing = False
         self._last_pos = None
+        self._stroke_painter = None # Open on _active_pixmap from press to release
         self.mode = 'brush'
         self.brush_size = 8
-        self.brush_color = QColor(255, 0, 0, 70)
+        self._brush_color = QColor(255, 0, 0, 70)
         self.setFocusPolicy(Qt.StrongFocus)
 
+        # Brush moves are buffered in widget coordinates and flushed at ~60 Hz, so a
+        # burst of moves costs one vectorised mapping and one rasterised polyline.
+        self._pending_points = []
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(16)
+        self._flush_timer.timeout.connect(self._flush_stroke)
+
     def set_brush_mode(self):
         self.mode = 'brush'
 
@@ -25,60 +73,93 @@ class MaskPanel(BasePanel):
         self.mode = 'eraser'
 
     def finalize_annotation(self):
-        if self._active_mask:
-            self._annotations.append(self._active_mask)
+        self._end_stroke()
+        if self._active_mask is not None:
+            self._annotations.append(encode_mask(self._active_mask))
             self._active_mask = None
+            self._active_pixmap = None
+            self._composite_pixmap = None
             self.new_annotation.emit()
 
     def _reset_mask(self):
         if self.parent() and hasattr(self.parent(), '_pixmap') and self.parent()._pixmap:
             image_size = self.parent()._pixmap.size()
-            self._active_mask = QPixmap(image_size)
-            self._active_mask.fill(Qt.transparent)
+            self._active_mask = np.zeros((image_size.height(), image_size.width()), dtype=np.uint8)
+            self._active_pixmap = QPixmap(image_size)
+            self._active_pixmap.fill(Qt.transparent)
         else:
             self._active_mask = None
-        self.parent().update_annotations_display()
+            self._active_pixmap = None
 
     def get_annotations(self):
-        return {
-            "completed": self._annotations,
-            "active": self._active_mask
-        }
+        return AnnotationBatch(masks=self._annotations, active=self._active_pixmap, mask_layer=self._mask_layer())
+
+    def _mask_layer(self):
+        if not self._annotations:
+            return None
+        if self._composite_pixmap is None:
+            union = decode_mask(self._annotations[0]).copy()
+            for rle in self._annotations[1:]:
+                np.bitwise_or(union, decode_mask(rle), out=union)
+            self._composite_pixmap = mask_to_pixmap(union, self._brush_color)
+        return self._composite_pixmap
 
     def delete_annotation(self, index):
         if 0 <= index < len(self._annotations):
             self._annotations.pop(index)
+            self._composite_pixmap = None
             return True
         return False
 
     def clear_annotations(self):
+        self._end_stroke()
         self._annotations.clear()
         self._active_mask = None
-        if self.parent():
-            self.parent().update()
-
-    def _paint_stroke(self, to_pos: QPoint):
-        if self._active_mask is None: return
-
-        painter = QPainter(self._active_mask)
-        
-        if self.mode == 'eraser':
-            painter.setCompositionMode(QPainter.CompositionMode_Source)
-            pen_color = QColor(0, 0, 0, 0)
-            pen = QPen(pen_color, self.brush_size, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
+        self._active_pixmap = None
+        self._composite_pixmap = None
+        self.annotations_changed.emit()
+
+    def _flush_stroke(self):
+        self._flush_timer.stop()
+        if not self._pending_points: return
+        image_points = self.parent().map_many_to_image(np.asarray(self._pending_points, dtype=np.int32))
+        self._pending_points = []
+        self._paint_stroke(image_points)
+
+    def _begin_stroke(self):
+        if self._active_pixmap is None: return
+        # Stroke regions are copied from the mask as-is, erased pixels included.
+        painter = QPainter(self._active_pixmap)
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        self._stroke_painter = painter
+
+    def _end_stroke(self):
+        if self._stroke_painter is not None:
+            self._stroke_painter.end()
+            self._stroke_painter = None
+
+    def _paint_stroke(self, points):
+        painter = self._stroke_painter
+        if painter is None or not len(points): return
+
+        if self._last_pos is not None:
+            points = np.vstack((self._last_pos, points))
+        value = 0 if self.mode == 'eraser' else 255
+        if len(points) == 1:
+            cv2.circle(self._active_mask, (int(points[0, 0]), int(points[0, 1])), self.brush_size // 2, value, -1)
         else:
-            painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
-            pen = QPen(self.brush_color, self.brush_size, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
-        
-        painter.setPen(pen)
-        if self._last_pos:
-            painter.drawLine(self._last_pos, to_pos)
-        else:
-            painter.drawPoint(to_pos)
-        painter.end()
+            cv2.polylines(self._active_mask, [points.reshape(-1, 1, 2)], False, value, self.brush_size)
+
+        # Refresh only the part of the display pixmap the stroke can have touched.
+        h, w = self._active_mask.shape
+        r = self.brush_size // 2 + 1
+        x0, y0 = np.maximum(points.min(axis=0) - r, 0)
+        x1, y1 = np.minimum(points.max(axis=0) + r + 1, (w, h))
+        region = np.ascontiguousarray(self._active_mask[y0:y1, x0:x1])
+        painter.drawImage(int(x0), int(y0), mask_to_image(region, self._brush_color))
 
-        self._last_pos = to_pos
-        self.parent().update()
+        self._last_pos = points[-1]
+        self.annotations_changed.emit()
 
     def mousePressEvent(self, event):
         image_pos = self.parent().map_to_image(event.pos())
@@ -89,18 +170,21 @@ class MaskPanel(BasePanel):
                 self._reset_mask()
             self._is_drawing = True
             self._last_pos = None
-            self._paint_stroke(image_pos)
+            self._begin_stroke()
+            self._paint_stroke(np.array([[image_pos.x(), image_pos.y()]], dtype=np.int32))
         
     def mouseMoveEvent(self, event):
         if not self._is_drawing:
             return
-        image_pos = self.parent().map_to_image(event.pos())
-        if not image_pos:
-            return
-        self._paint_stroke(image_pos)
+        pos = event.pos()
+        self._pending_points.append((pos.x(), pos.y()))
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
 
     def mouseReleaseEvent(self, event):
         if self._is_drawing and event.button() == Qt.LeftButton:
+            self._flush_stroke()
+            self._end_stroke()
             self._is_drawing = False
         elif event.button() == Qt.RightButton:
             self.finalize_annotation()
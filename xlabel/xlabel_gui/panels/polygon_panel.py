@@ -1,6 +1,6 @@
-from PySide6.QtCore import Signal, QPoint, Qt
-from PySide6.QtGui import QKeyEvent
-from .base_panel import BasePanel
+from PySide6.QtCore import Signal, QPoint, QPointF, Qt
+from PySide6.QtGui import QKeyEvent, QPolygonF
+from .base_panel import BasePanel, AnnotationBatch
 
 class PolygonPanel(BasePanel):
     # --- THE FIX: Signal is now argument-free for consistency ---
@@ -8,8 +8,10 @@ class PolygonPanel(BasePanel):
 
     def __init__(self, parent=None):
         super().__init__(parent)
+        # Polygons are kept as QPolygonF so the viewer can draw them without
+        # converting the vertex list on every paint.
         self._annotations = []
-        self._active_polygon = []
+        self._active_polygon = QPolygonF()
         self._cursor_pos = None
         self.setMouseTracking(True)
         self.setFocusPolicy(Qt.StrongFocus)
@@ -17,27 +19,28 @@ class PolygonPanel(BasePanel):
     def setVisible(self, visible):
         super().setVisible(visible)
         if not visible:
-            self._active_polygon = []
+            self._repaint_timer.stop()
+            self._active_polygon = QPolygonF()
             self._cursor_pos = None
 
     def get_annotations(self):
-        return {
-            "completed": self._annotations,
-            "active": self._active_polygon,
-            "cursor_pos": self._cursor_pos
-        }
+        return AnnotationBatch(polys=self._annotations, active=self._active_polygon, cursor_pos=self._cursor_pos)
 
     # --- THE FIX: This method is no longer needed with the new architecture ---
     # def add_annotation(self, polygon): ...
 
     # --- THE FIX: A new private method to handle finishing a polygon ---
     def _finalize_polygon(self):
-        if self._active_polygon and len(self._active_polygon) > 2:
-            self._annotations.append(list(self._active_polygon))
-            self.new_annotation.emit()
-        self._active_polygon = []
+        polygon = self._active_polygon
+        self._active_polygon = QPolygonF()
         self._cursor_pos = None
-        self.parent().update()
+        self._repaint_timer.stop()
+        if polygon.size() > 2:
+            # new_annotation already refreshes the viewer's stash.
+            self._annotations.append(polygon)
+            self.new_annotation.emit()
+        else:
+            self.annotations_changed.emit()
 
     def delete_annotation(self, index):
         if 0 <= index < len(self._annotations):
@@ -47,29 +50,40 @@ class PolygonPanel(BasePanel):
 
     def clear_annotations(self):
         self._annotations.clear()
-        self._active_polygon = []
-        if self.parent():
-            self.parent().update()
+        self._active_polygon = QPolygonF()
+        self.annotations_changed.emit()
 
     def mousePressEvent(self, event):
         image_pos = self.parent().map_to_image(event.pos())
         if not image_pos: return
 
         if event.button() == Qt.LeftButton:
-            self._active_polygon.append(image_pos)
-            self.parent().update()
+            self._cursor_pos = QPointF(image_pos)
+            self._active_polygon.append(self._cursor_pos)
+            self.annotations_changed.emit()
         elif event.button() == Qt.RightButton:
             self._finalize_polygon()
 
     def mouseMoveEvent(self, event):
-        self._cursor_pos = self.parent().map_to_image(event.pos())
-        self.parent().update()
+        # The cursor is only drawn as the rubber band of an in-progress polygon, so
+        # hovering with no polygon started costs nothing.
+        if self._active_polygon.isEmpty():
+            return
+        image_pos = self.parent().map_to_image(event.pos())
+        old_cursor_pos = self._cursor_pos
+        # Kept as QPointF so the viewer can draw the rubber-band segment without converting it.
+        self._cursor_pos = QPointF(image_pos) if image_pos is not None else None
+        # Only the old and new segments from the last vertex need repainting.
+        segment_ends = [p for p in (old_cursor_pos, self._cursor_pos) if p is not None]
+        self._schedule_repaint(QPolygonF([self._active_polygon.last()] + segment_ends).boundingRect())
 
     def keyPressEvent(self, event: QKeyEvent):
         if event.key() == Qt.Key_Return or event.key() == Qt.Key_Enter:
             self._finalize_polygon()
         elif event.key() == Qt.Key_Escape:
-            self._active_polygon = []
-            self.parent().update()
+            self._active_polygon = QPolygonF()
+            self._cursor_pos = None
+            self._repaint_timer.stop()
+            self.annotations_changed.emit()
         else:
             super().keyPressEvent(event)
\ No newline at end of file